@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the hot paths of fin.cache.  Run from a checkout with:
+
+    python benchmarks/cache_benchmark.py --output before.json
+    ... make changes ...
+    python benchmarks/cache_benchmark.py --output after.json --compare before.json
+
+Each benchmark is timed with timeit, taking the best of several repeats, and reported in nanoseconds per operation.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import fin.cache
+
+
+BENCHMARKS = []
+
+
+def benchmark(number):
+    """
+    Registers a benchmark.  The decorated function sets up the benchmark, and returns a callable that does one
+    operation, which is timed ``number`` times per repeat.
+    """
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, setup, number))
+        return setup
+    return register
+
+
+class Example(fin.cache.Tracked):
+
+    def __init__(self):
+        self.value = 1
+
+    @fin.cache.method
+    def method(self, a, b=None):
+        return a
+
+    @fin.cache.method(maxsize=1000)
+    def bounded_method(self, a):
+        return a
+
+    @fin.cache.property
+    def prop(self):
+        return 1
+
+    @fin.cache.property
+    @fin.cache.depends("value")
+    def depends_prop(self):
+        return self.value
+
+    @fin.cache.property
+    @fin.cache.depends("value", tracked=True)
+    def tracked_prop(self):
+        return self.value
+
+    def plain(self):
+        pass
+
+    @fin.cache.invalidates(prop)
+    def invalidating(self):
+        pass
+
+
+@fin.cache.function
+def function(a, b=None):
+    return a
+
+
+@benchmark(number=200000)
+def method_hit_hashable():
+    example = Example()
+    example.method(1, 2)
+    return lambda: example.method(1, 2)
+
+
+@benchmark(number=100000)
+def method_hit_unhashable():
+    example = Example()
+    example.method([1, 2], {"a": 1})
+    return lambda: example.method([1, 2], {"a": 1})
+
+
+@benchmark(number=100000)
+def method_hit_keyword():
+    example = Example()
+    example.method(1, b=2)
+    return lambda: example.method(1, b=2)
+
+
+@benchmark(number=200000)
+def method_hit_bounded():
+    example = Example()
+    example.bounded_method(1)
+    return lambda: example.bounded_method(1)
+
+
+@benchmark(number=50000)
+def method_miss_hashable():
+    example = Example()
+    counter = itertools.count()
+    return lambda: example.method(next(counter))
+
+
+@benchmark(number=20000)
+def method_miss_unhashable():
+    example = Example()
+    counter = itertools.count()
+    return lambda: example.method([next(counter)])
+
+
+@benchmark(number=200000)
+def function_hit():
+    function(1, 2)
+    return lambda: function(1, 2)
+
+
+@benchmark(number=200000)
+def property_hit():
+    example = Example()
+    example.prop
+    return lambda: example.prop
+
+
+@benchmark(number=100000)
+def property_hit_depends():
+    example = Example()
+    example.depends_prop
+    return lambda: example.depends_prop
+
+
+@benchmark(number=200000)
+def property_hit_tracked_depends():
+    example = Example()
+    example.tracked_prop
+    return lambda: example.tracked_prop
+
+
+@benchmark(number=200000)
+def uncached_method_baseline():
+    example = Example()
+    return example.plain
+
+
+@benchmark(number=100000)
+def invalidates_call():
+    example = Example()
+    return example.invalidating
+
+
+@benchmark(number=20)
+def dynamic_tee_first_pass():
+    # 10,000 values per operation, read through a fresh tee
+    return lambda: list(fin.cache.DynamicTee(iter(range(10000))).get_copy())
+
+
+@benchmark(number=20)
+def dynamic_tee_replay():
+    tee = fin.cache.DynamicTee(iter(range(10000)))
+    list(tee.get_copy())
+    return lambda: list(tee.get_copy())
+
+
+@benchmark(number=20)
+def dynamic_tee_batched():
+    return lambda: list(fin.cache.DynamicTee(iter(range(10000)), batch_size=64).get_copy())
+
+
+def run(names=None, repeat=5, scale=1.0):
+    results = {}
+    for name, setup, number in BENCHMARKS:
+        if names and not any(part in name for part in names):
+            continue
+        number = max(1, int(number * scale))
+        timer = timeit.Timer(setup())
+        best = min(timer.repeat(repeat=repeat, number=number))
+        results[name] = {"ns_per_op": best / number * 1e9, "number": number, "repeat": repeat}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fin.cache")
+    parser.add_argument("names", nargs="*", help="Only run benchmarks whose names contain one of these")
+    parser.add_argument("--repeat", type=int, default=5, help="Take the best of this many runs of each benchmark")
+    parser.add_argument("--quick", action="store_true", help="Run each benchmark a tenth as many times")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against the results in this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.names, repeat=args.repeat, scale=0.1 if args.quick else 1.0)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+
+    for name in sorted(results):
+        line = "%-32s %12.1f ns" % (name, results[name]["ns_per_op"])
+        if name in baseline:
+            line += "  %6.2fx" % (results[name]["ns_per_op"] / baseline[name]["ns_per_op"])
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "results": results,
+            }, fh, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
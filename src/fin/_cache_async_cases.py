@@ -0,0 +1,235 @@
+"""
+The asyncio parts of fin.cache_test.  These use syntax that older Pythons can't parse, so they are only imported, by
+fin.cache_async_test, on versions that can run them.
+"""
+
+import asyncio
+import itertools
+
+import fin.testing
+import fin.cache
+from fin.cache_test import FakeClock
+
+
+class TestCoroutine(fin.testing.TestCase):
+
+    def test_coroutine(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.coroutine
+            async def fetch(self, num):
+                calls.append(num)
+                await asyncio.sleep(0.01)
+                return num * 2
+
+        foo = Foo()
+        async def main():
+            first = await asyncio.gather(foo.fetch(1), foo.fetch(1), foo.fetch(2))
+            second = await foo.fetch(1)
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), ([2, 2, 4], 2))
+        self.assertEqual(calls, [1, 2])
+        self.assertTrue(Foo.fetch.has_cached(foo))
+        Foo.fetch.reset(foo)
+        self.assertEqual(asyncio.run(main()), ([2, 2, 4], 2))
+        self.assertEqual(calls, [1, 2, 1, 2])
+
+    def test_failures_are_not_cached(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.coroutine
+            async def fetch(self):
+                calls.append(1)
+                raise KeyError("nope")
+
+        foo = Foo()
+        async def main():
+            for _ in range(2):
+                with self.assertRaises(KeyError):
+                    await foo.fetch()
+
+        asyncio.run(main())
+        self.assertEqual(len(calls), 2)
+
+    def test_cancelling_one_caller(self):
+        class Foo(object):
+            @fin.cache.coroutine
+            async def fetch(self):
+                await asyncio.sleep(0.02)
+                return "done"
+
+        foo = Foo()
+        async def main():
+            impatient = asyncio.ensure_future(foo.fetch())
+            await asyncio.sleep(0)
+            impatient.cancel()
+            return await foo.fetch()
+
+        self.assertEqual(asyncio.run(main()), "done")
+
+    def test_property(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.property
+            async def prop(self):
+                calls.append(1)
+                return 4
+
+        foo = Foo()
+        async def main():
+            return (await foo.prop) + (await foo.prop)
+
+        self.assertEqual(asyncio.run(main()), 8)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(Foo.prop.has_cached(foo))
+
+    def test_fast_property(self):
+        with self.assertRaises(TypeError):
+            @fin.cache.property(fast=True)
+            async def prop(self):
+                return 4
+
+    def test_temporary_cache(self):
+        values = iter([1, 2])
+        class Foo(object):
+            @fin.cache.coroutine
+            async def fetch(self):
+                return next(values)
+
+        foo = Foo()
+        async def main():
+            first = await foo.fetch()
+            with Foo.fetch.temporary_cache(foo):
+                second = await foo.fetch()
+            return first, second, await foo.fetch()
+
+        self.assertEqual(asyncio.run(main()), (1, 2, 1))
+
+
+class TestAsyncGenerator(fin.testing.TestCase):
+
+    def _collect(self, iterator):
+        async def collect():
+            return [value async for value in iterator]
+        return collect()
+
+    def test_replay(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.async_generator
+            async def gen(self, num):
+                calls.append(num)
+                for i in range(num):
+                    await asyncio.sleep(0)
+                    yield i
+
+        foo = Foo()
+        async def main():
+            first = await self._collect(foo.gen(3))
+            second = await self._collect(foo.gen(3))
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), ([0, 1, 2], [0, 1, 2]))
+        self.assertEqual(calls, [3])
+        self.assertTrue(Foo.gen.has_cached(foo))
+        Foo.gen.reset(foo)
+        self.assertFalse(Foo.gen.has_cached(foo))
+
+    def test_concurrent_consumers(self):
+        produced = []
+        class Foo(object):
+            @fin.cache.async_generator
+            async def gen(self):
+                for i in range(5):
+                    await asyncio.sleep(0.001)
+                    produced.append(i)
+                    yield i
+
+        foo = Foo()
+        async def main():
+            return await asyncio.gather(*[self._collect(foo.gen()) for _ in range(4)])
+
+        self.assertEqual(asyncio.run(main()), [list(range(5))] * 4)
+        self.assertEqual(produced, list(range(5)))
+
+    def test_prefetch(self):
+        produced = []
+        class Foo(object):
+            @fin.cache.async_generator(prefetch=3)
+            async def gen(self):
+                for i in range(10):
+                    produced.append(i)
+                    yield i
+
+        foo = Foo()
+        async def main():
+            iterator = foo.gen()
+            first = await iterator.__anext__()
+            await asyncio.sleep(0.01)
+            return first, list(produced)
+
+        self.assertEqual(asyncio.run(main()), (0, [0, 1, 2, 3]))
+
+    def test_errors(self):
+        class Foo(object):
+            @fin.cache.async_generator
+            async def gen(self):
+                yield 1
+                raise KeyError("nope")
+
+        foo = Foo()
+        async def main():
+            for _ in range(2):
+                seen = []
+                with self.assertRaises(KeyError):
+                    async for value in foo.gen():
+                        seen.append(value)
+                self.assertEqual(seen, [1])
+
+        asyncio.run(main())
+
+
+class TestAsyncBackgroundRefresh(fin.testing.TestCase):
+
+    def test_coroutine(self):
+        clock = FakeClock()
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.coroutine(ttl=10, clock=clock, refresh="background")
+            async def fetch(self):
+                await asyncio.sleep(0.01)
+                return next(counter)
+
+        foo = Foo()
+        async def main():
+            first = await foo.fetch()
+            clock.now += 11
+            stale = await foo.fetch()
+            await asyncio.sleep(0.05)
+            return first, stale, await foo.fetch()
+
+        self.assertEqual(asyncio.run(main()), (0, 0, 1))
+
+
+class TestAsyncScope(fin.testing.TestCase):
+
+    def test_tasks(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.property
+            def prop(self):
+                return next(counter)
+
+        foo = Foo()
+        async def in_scope():
+            with fin.cache.scope():
+                first = foo.prop
+                await asyncio.sleep(0.01)
+                return first, foo.prop
+
+        async def main():
+            return await asyncio.gather(in_scope(), in_scope())
+
+        self.assertEqual(sorted(asyncio.run(main())), [(0, 0), (1, 1)])
+        self.assertEqual(foo.prop, 2)
@@ -1,17 +1,725 @@
 
+import collections
+import bisect
 import functools
 import copy
+import hashlib
+import heapq
+import inspect
 import contextlib
+import itertools
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import types
+import weakref
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
 
 # Class objects do not like having their __dict__ members
 # twiddled directly, so we have to use strings here
 CACHE_KEY = "__FIN_CACHE"
 PROPERTY_OVERRIDE_KEY = "__PROPERTY_CACHE"
 DEPENDENCIES = object()
+TRACKED_DEPENDENCIES = object()
+# Key in an object's cache dict mapping attribute names to the ResultCaches that depend on them
+DEPENDANTS = object()
+MISSING = object()
+
+CacheInfo = collections.namedtuple("CacheInfo", "hits misses evictions maxsize entries bytes time_saved")
+
+_monotonic = getattr(time, "monotonic", time.time)
+_perf_counter = getattr(time, "perf_counter", time.time)
+_get_ident = getattr(threading, "get_ident", None) or threading._get_ident
+# Python 2 has no inspect.signature, function keys are built with inspect.getcallargs instead
+_signature = getattr(inspect, "signature", None)
+# Python 2 has no weakref.finalize, but its files close (without a ResourceWarning) when they're collected
+_finalize = getattr(weakref, "finalize", None)
+
+# ResultCaches with a ttl, so that expired entries can be swept in the background
+_EXPIRING_CACHES = weakref.WeakSet()
+# Every ResultCache, for fin.cache.stats()
+_ALL_CACHES = weakref.WeakSet()
+# tag -> the ResultCaches created with that tag, for fin.cache.invalidate_tag()
+_TAGGED_CACHES = {}
+# The process-wide MemoryBudget, if fin.cache.set_memory_budget() has been called
+_BUDGET = None
+
+
+class _FrozenTag(object):
+
+    """
+    Marks the type of a frozen container in a key.  Being neither a string nor any other value that could be passed as an
+    argument, a tagged tuple can't be mistaken for a frozen container.  Tags pickle by name, so keys stay the same across
+    processes (which backends rely on)
+    """
+
+    __slots__ = ("name", )
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "fin.cache.%s" % self.name
+
+    def __reduce__(self):
+        return self.name
+
+
+# Prefixes for frozen containers, so that, for example, [1, 2] and (1, 2) are still different keys
+FROZEN_LIST = _FrozenTag("FROZEN_LIST")
+FROZEN_DICT = _FrozenTag("FROZEN_DICT")
+FROZEN_BYTES = _FrozenTag("FROZEN_BYTES")
+# Types that are always hashable, so freeze() doesn't need to try
+_SCALAR_TYPES = frozenset([type(None), bool, int, float, str, bytes, type(u"")] + ([long] if sys.version_info[0] < 3 else []))
+
+
+# id(obj) -> (weak reference to obj, cache dict), for caches using storage="weak"
+_WEAK_CACHES = {}
 
 
 def _hasattr(obj, key):
-    return key in obj.__dict__
+    try:
+        return key in obj.__dict__
+    except AttributeError:  # Objects using __slots__
+        return False
+
+
+def _instance_cache(obj, create):
+    """
+    Returns the dict of cached results that is stored on ``obj`` itself, or None
+    """
+    try:
+        cache = obj.__dict__.get(CACHE_KEY)
+    except AttributeError:
+        if create:
+            raise TypeError("%s has no __dict__ to store cached results in, use storage='weak' instead"
+                            % type(obj).__name__)
+        return None
+    if cache is None and create:
+        setattr(obj, CACHE_KEY, {})
+        cache = getattr(obj, CACHE_KEY)
+    return cache
+
+
+def _weak_cache(obj, create):
+    """
+    Returns the dict of cached results for ``obj`` held in a side table, or None.  The dict is dropped when
+    ``obj`` is garbage collected.
+    """
+    entry = _WEAK_CACHES.get(id(obj))
+    if entry is not None:
+        return entry[1]
+    if not create:
+        return None
+    obj_id = id(obj)
+
+    def forget(ref):
+        if _WEAK_CACHES.get(obj_id, (None, ))[0] is ref:
+            del _WEAK_CACHES[obj_id]
+
+    try:
+        ref = weakref.ref(obj, forget)
+    except TypeError:
+        raise TypeError("%s does not support weak references, add '__weakref__' to its __slots__"
+                        % type(obj).__name__)
+    return _WEAK_CACHES.setdefault(obj_id, (ref, {}))[1]
+
+
+OBJECT_STORAGE = {
+    "instance": _instance_cache,
+    "weak": _weak_cache,
+}
+
+
+# The number of fin.cache.scope()s currently active, in any thread or task, so that the cache
+# only has to look for the current scope when there might be one
+_ACTIVE_SCOPES = 0
+_ACTIVE_SCOPES_LOCK = threading.Lock()
+
+if contextvars is not None:
+    _CURRENT_SCOPE = contextvars.ContextVar("fin.cache.scope", default=None)
+
+    def _current_scope():
+        return _CURRENT_SCOPE.get()
+
+    def _enter_scope(scope):
+        return _CURRENT_SCOPE.set(scope)
+
+    def _exit_scope(token):
+        _CURRENT_SCOPE.reset(token)
+else:
+    _SCOPE_LOCAL = threading.local()
+
+    def _current_scope():
+        return getattr(_SCOPE_LOCAL, "scope", None)
+
+    def _enter_scope(scope):
+        token = _current_scope()
+        _SCOPE_LOCAL.scope = scope
+        return token
+
+    def _exit_scope(token):
+        _SCOPE_LOCAL.scope = token
+
+
+class Scope(object):
+
+    """
+    A scratch cache that, while active, holds the results of every cached call, see :func:`fin.cache.scope`
+    """
+
+    def __init__(self):
+        self._stores = {}  # (ResultCache, id(obj)) -> (obj, store)
+        self._active = False
+        self._token = None
+
+    def get_store(self, cache, obj):
+        entry = self._stores.get((cache, id(obj)))
+        if entry is None:
+            # Keeps obj alive, so its id can't be reused by another object while the scope is active
+            entry = self._stores[(cache, id(obj))] = (obj, cache._new_store(local=True))
+        return entry[1]
+
+    def existing_store(self, cache, obj):
+        entry = self._stores.get((cache, id(obj)))
+        return None if entry is None else entry[1]
+
+    def discard(self, cache, obj):
+        self._stores.pop((cache, id(obj)), None)
+
+    def replace_store(self, cache, obj, store):
+        """
+        Swaps in ``store`` for cache's results on obj, and returns the old entry, to pass to :meth:`restore_store`
+        """
+        old_entry = self._stores.get((cache, id(obj)))
+        self._stores[(cache, id(obj))] = (obj, store)
+        return old_entry
+
+    def restore_store(self, cache, obj, entry):
+        if not self._active:
+            return
+        if entry is None:
+            self._stores.pop((cache, id(obj)), None)
+        else:
+            self._stores[(cache, id(obj))] = entry
+
+    def clear(self):
+        """
+        Forgets everything cached in this scope so far.
+        """
+        self._stores.clear()
+
+    def __enter__(self):
+        global _ACTIVE_SCOPES
+        if self._active:
+            raise RuntimeError("This fin.cache.scope() is already active")
+        self._active = True
+        with _ACTIVE_SCOPES_LOCK:
+            _ACTIVE_SCOPES += 1
+        self._token = _enter_scope(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        global _ACTIVE_SCOPES
+        _exit_scope(self._token)
+        self._active = False
+        self._token = None
+        self._stores.clear()
+        with _ACTIVE_SCOPES_LOCK:
+            _ACTIVE_SCOPES -= 1
+
+
+def scope():
+    """
+    Returns a context manager, inside which every cached method, property, generator and function reads and writes
+    results in a scratch store, rather than its usual one.  The results are all dropped when the block exits, which
+    suits caching things for the duration of, say, one web request::
+
+        >>> with fin.cache.scope():
+        >>>     user.permissions          # Computed
+        >>>     user.permissions          # Cached
+        >>> user.permissions              # Computed again, the cached result went with the scope
+
+    Scopes follow ``contextvars``, so each thread, and each asyncio task, sees only the scope that it (or, for tasks, the
+    code that created it) entered.  Nested scopes start empty.  Objects with cached results in a scope are kept alive
+    until it exits.  ``@fin.cache.property(fast=True)`` stores values on the object, so isn't affected.  When no scope is
+    active, the cost of supporting them is a single check of a global counter.
+    """
+    return Scope()
+
+
+def freeze(value):
+    """
+    Returns a hashable equivalent of ``value``, by recursively converting lists, dicts, sets and bytearrays
+    into tuples/frozensets.  Two values that compare equal freeze to equal keys.  Values that are already hashable
+    are returned as-is, and other unhashable values are left for the caller to deal with::
+
+        >>> fin.cache.freeze({"a": [1, 2]})
+        (fin.cache.FROZEN_DICT, frozenset({('a', (fin.cache.FROZEN_LIST, 1, 2))}))
+    """
+    if type(value) in _SCALAR_TYPES:
+        return value
+    return _freeze(value)
+
+
+def _freeze(value):
+    # This runs on every call with unhashable arguments, so it avoids calls for scalars, generators (list comprehensions are
+    # cheaper), and failed hash()es (which are comparatively slow) for the types it knows how to convert
+    cls = type(value)
+    if cls is tuple:
+        return tuple([item if type(item) in _SCALAR_TYPES else _freeze(item) for item in value])
+    if cls is list:
+        return (FROZEN_LIST, ) + tuple([item if type(item) in _SCALAR_TYPES else _freeze(item) for item in value])
+    if cls is dict:
+        return (FROZEN_DICT, frozenset([
+            (key, item if type(item) in _SCALAR_TYPES else _freeze(item)) for key, item in value.items()]))
+    if cls in _SCALAR_TYPES:
+        return value
+    try:
+        hash(value)
+    except TypeError:
+        pass
+    else:
+        return value
+    # Subclasses are frozen as their base type
+    for base in (tuple, list, dict):
+        if isinstance(value, base):
+            return _freeze(base(value))
+    if isinstance(value, (set, frozenset)):
+        # Equal to the frozenset of the same values, as the set itself is
+        return frozenset(value)
+    if isinstance(value, bytearray):
+        return (FROZEN_BYTES, bytes(value))
+    return value
+
+
+def estimate_size(value):
+    """
+    Returns the approximate number of bytes used by ``value``, including, for lists, tuples, sets and dicts, the values
+    they contain.  Objects that support the buffer protocol, such as numpy arrays and memoryviews, are counted by their
+    ``nbytes``, so views of large buffers count the whole buffer.
+    """
+    seen = set()
+    pending = [value]
+    total = 0
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size = sys.getsizeof(value)
+        nbytes = getattr(value, "nbytes", None)
+        if nbytes is None and isinstance(value, memoryview):
+            # Python 2 memoryviews have no nbytes
+            nbytes = value.itemsize
+            for length in value.shape or ():
+                nbytes *= length
+            nbytes = int(nbytes)
+        if isinstance(nbytes, int) and nbytes > size:
+            size = nbytes
+        total += size
+        if isinstance(value, (list, tuple, set, frozenset)):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+    return total
+
+
+def _invalidate_dependants(obj, name):
+    for get_cache in (_instance_cache, _weak_cache):
+        cache = get_cache(obj, False)
+        if not cache or DEPENDANTS not in cache:
+            continue
+        for result_cache in cache[DEPENDANTS].pop(name, ()):
+            result_cache.reset(obj)
+
+
+def _hashable_key(key):
+    try:
+        frozen = _freeze(key)
+        hash(frozen)
+    except TypeError:
+        return key, False
+    return frozen, True
+
+
+class DictStore(dict):
+
+    """
+    The default, unbounded store.  Results for hashable arguments are held in the dict itself, and
+    results for unhashable arguments in the ``unhashable`` list of ``(key, result)`` pairs.
+    """
+
+    def __init__(self):
+        super(DictStore, self).__init__()
+        self.unhashable = []
+
+
+class LRUStore(collections.OrderedDict):
+
+    """
+    A mapping that holds at most ``maxsize`` entries.  Once full, adding a new entry discards the
+    entry that was least recently read or written.
+    """
+
+    def __init__(self, maxsize, on_evict=None):
+        super(LRUStore, self).__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.unhashable = []
+
+    if not hasattr(collections.OrderedDict, "move_to_end"):
+        # Python 2
+        def move_to_end(self, key):
+            value = collections.OrderedDict.pop(self, key)
+            collections.OrderedDict.__setitem__(self, key, value)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+            self.move_to_end(key)
+        except KeyError:
+            # Including when another thread (e.g. the memory budget) removed it just after it was read
+            return default
+        return value
+
+    def __setitem__(self, key, value):
+        super(LRUStore, self).__setitem__(key, value)
+        try:
+            self.move_to_end(key)
+        except KeyError:
+            # Removed by another thread straight away
+            return
+        while len(self) > self.maxsize:
+            old_key, old_value = self.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_value)
+
+
+class LFUStore(object):
+
+    """
+    A mapping that holds at most ``maxsize`` entries.  Once full, adding a new entry discards the
+    entry that has been used the fewest times (ties are broken by discarding the oldest).
+
+    Keys are grouped into buckets by use count, so lookups, inserts and evictions are all O(1).
+    """
+
+    def __init__(self, maxsize, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.unhashable = []
+        self.clear()
+
+    def clear(self):
+        self._values = {}
+        self._counts = {}
+        self._buckets = {}
+        self._min_count = 0
+
+    def _touch(self, key):
+        try:
+            count = self._counts[key]
+            bucket = self._buckets[count]
+            del bucket[key]
+        except KeyError:
+            # Removed by another thread since it was read
+            return
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets.setdefault(count + 1, collections.OrderedDict())[key] = None
+
+    def _evict(self):
+        if self._min_count not in self._buckets:
+            # Only happens after an explicit delete emptied the lowest bucket
+            self._min_count = min(self._buckets)
+        bucket = self._buckets[self._min_count]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[self._min_count]
+        del self._counts[key]
+        value = self._values.pop(key)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def get(self, key, default=None):
+        value = self._values.get(key, MISSING)
+        if value is MISSING:
+            return default
+        self._touch(key)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._values:
+            self._values[key] = value
+            self._touch(key)
+            return
+        while self._values and len(self._values) >= self.maxsize:
+            self._evict()
+        self._values[key] = value
+        self._counts[key] = 1
+        self._buckets.setdefault(1, collections.OrderedDict())[key] = None
+        self._min_count = 1
+
+    def __delitem__(self, key):
+        del self._values[key]
+        count = self._counts.pop(key, None)
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            return
+        bucket.pop(key, None)
+        if not bucket:
+            self._buckets.pop(count, None)
+
+    def pop(self, key, default=MISSING):
+        if key not in self._values:
+            if default is MISSING:
+                raise KeyError(key)
+            return default
+        value = self._values[key]
+        del self[key]
+        return value
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(list(self._values))
+
+    def keys(self):
+        return list(self._values)
+
+    def items(self):
+        return list(self._values.items())
+
+
+EVICTION_POLICIES = {
+    "lru": LRUStore,
+    "lfu": LFUStore,
+}
+
+REFRESH_MODES = (None, "background")
+
+
+class _NoLock(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NO_LOCK = _NoLock()
+
+
+class _Flight(object):
+
+    """
+    A computation in progress, that other threads can wait for.
+    """
+
+    def __init__(self):
+        self.owner = _get_ident()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def succeed(self, result):
+        self._result = result
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class _CachedError(object):
+
+    """
+    Stands in for the result of a call that raised one of a cache's ``cache_exceptions``
+    """
+
+    __slots__ = ("error", "expires")
+
+    def __init__(self, error, expires):
+        # The exception itself, as rebuilding one through its __init__ can change it.  It's left untouched here, as the
+        # call that failed is still raising it, and the traceback is only dropped once the exception is raised again
+        self.error = error
+        self.expires = expires
+
+    def reraise(self):
+        # Cleared each time, so that the failed call's frames aren't kept alive, and the tracebacks and contexts of
+        # earlier raises don't pile up on it
+        error = self.error
+        error.__traceback__ = None
+        error.__context__ = None
+        error.__cause__ = None
+        raise error
+
+
+class _Charge(object):
+
+    """
+    The memory budget's record of one cached result
+    """
+
+    __slots__ = ("cache", "store_id", "key", "size", "cost", "hits", "counted_hits", "priority", "live")
+
+    def __init__(self, cache, store_id, key, size, cost):
+        self.cache = cache
+        self.store_id = store_id
+        self.key = key
+        self.size = size
+        self.cost = cost
+        self.hits = 1
+        self.counted_hits = 1
+        self.priority = None
+        self.live = True
+
+
+class MemoryBudget(object):
+
+    """
+    Keeps the results held by all the fin caches in the process under ``max_bytes`` (approximately), see
+    :func:`fin.cache.set_memory_budget`.
+
+    When over budget, results are evicted using Greedy-Dual-Size-Frequency: each result is given a priority of
+    ``inflation + hits * cost / size``, where ``cost`` is the average time its method takes to compute, and the lowest
+    priority result is evicted first, raising ``inflation`` to its priority, so that results that have not been used for
+    a while eventually go, however expensive they were.  Priorities are only brought up to date with new hits when a result
+    reaches the front of the queue.
+    """
+
+    # Used as the cost of results from methods that haven't been timed yet (e.g. restored ones)
+    MIN_COST = 1e-6
+
+    def __init__(self, max_bytes):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative, got %r" % (max_bytes, ))
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.evictions = 0
+        self._inflation = 0.0
+        self._lock = threading.RLock()
+        self._charges = {}  # id(store) -> {key: _Charge}
+        self._store_refs = {}  # id(store) -> weak reference to the store
+        self._num_charges = 0
+        self._heap = []  # (priority, sequence number, _Charge), including outdated items, which are skipped
+        self._sequence = itertools.count()
+
+    def charge(self, cache, store, key, entry):
+        """
+        Starts counting a result that ``cache`` has just saved in ``store``
+        """
+        size = max(1, cache._sizeof(entry if cache.ttl is None else entry[0]))
+        cost = cache.compute_time / cache.timed_calls if cache.timed_calls else self.MIN_COST
+        with self._lock:
+            store_id = id(store)
+            charges = self._charges.get(store_id)
+            if charges is None:
+                charges = self._charges[store_id] = {}
+                self._store_refs[store_id] = weakref.ref(store, functools.partial(self._store_collected, store_id))
+            self._remove(charges.pop(key, None))
+            charge = charges[key] = _Charge(cache, store_id, key, size, max(cost, self.MIN_COST))
+            self.used += size
+            self._num_charges += 1
+            self._push(charge, self._inflation + charge.cost / size)
+            if len(self._heap) > 2 * self._num_charges + 64:
+                self._heap = [item for item in self._heap if item[2].live and item[2].priority == item[0]]
+                heapq.heapify(self._heap)
+
+    def hit(self, store, key):
+        # Unlocked, a hit lost to a race only makes the priority slightly less accurate
+        charges = self._charges.get(id(store))
+        if charges is not None:
+            charge = charges.get(key)
+            if charge is not None:
+                charge.hits += 1
+
+    def forget(self, store, key):
+        """
+        Stops counting a result that has been removed from ``store``
+        """
+        with self._lock:
+            charges = self._charges.get(id(store))
+            if charges is not None:
+                self._remove(charges.pop(key, None))
+
+    def forget_store(self, store_id):
+        with self._lock:
+            for charge in self._charges.pop(store_id, {}).values():
+                self._remove(charge)
+            self._store_refs.pop(store_id, None)
+
+    def _store_collected(self, store_id, ref):
+        if self._store_refs.get(store_id) is ref:
+            self.forget_store(store_id)
+
+    def _remove(self, charge):
+        if charge is not None and charge.live:
+            charge.live = False
+            self.used -= charge.size
+            self._num_charges -= 1
+
+    def _push(self, charge, priority):
+        charge.priority = priority
+        heapq.heappush(self._heap, (priority, next(self._sequence), charge))
+
+    def enforce(self):
+        """
+        Evicts results until the budget is met
+        """
+        if self.used <= self.max_bytes:
+            return
+        victims = []
+        with self._lock:
+            while self.used > self.max_bytes and self._heap:
+                priority, _, charge = heapq.heappop(self._heap)
+                if not charge.live or charge.priority != priority:
+                    continue
+                if charge.hits != charge.counted_hits:
+                    charge.counted_hits = charge.hits
+                    self._push(charge, self._inflation + charge.hits * charge.cost / charge.size)
+                    continue
+                self._inflation = priority
+                self._charges[charge.store_id].pop(charge.key, None)
+                self._remove(charge)
+                self.evictions += 1
+                victims.append((charge.cache, self._store_refs[charge.store_id](), charge.key))
+        # Removed without holding the budget's lock, as each cache takes its own lock to do this
+        for cache, store, key in victims:
+            if store is not None:
+                cache._evict(store, key)
 
 
 class ResultCache(object):
@@ -20,60 +728,504 @@ class ResultCache(object):
     Used internally to store and manage the cached results
     """
 
-    def __init__(self, fun):
+    # Whether the cached results are plain values, that snapshot() can save, and the memory budget can size
+    portable = True
+
+    def __init__(self, fun, maxsize=None, policy="lru", ttl=None, clock=None, key=None, threadsafe=False,
+                 backend=None, storage="instance", timed=False, batch=None, tags=(), sizeof=None, refresh=None,
+                 cache_exceptions=(), exception_ttl=None):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError("Unknown cache policy %r, expected one of: %s"
+                             % (policy, ", ".join(sorted(EVICTION_POLICIES))))
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1, got %r" % (maxsize, ))
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive, got %r" % (ttl, ))
+        if storage not in OBJECT_STORAGE:
+            raise ValueError("Unknown storage %r, expected one of: %s" % (storage, ", ".join(sorted(OBJECT_STORAGE))))
+        if backend is not None and maxsize is not None:
+            raise ValueError("maxsize cannot be used with a backend, the backend controls its own size")
+        if refresh not in REFRESH_MODES:
+            raise ValueError("Unknown refresh mode %r, expected None or one of: %s"
+                             % (refresh, ", ".join(sorted(mode for mode in REFRESH_MODES if mode))))
+        if refresh is not None and (ttl is None or self._start_refresh is None):
+            raise ValueError("refresh=%r needs a ttl, and a method or coroutine to refresh" % (refresh, ))
+        if isinstance(cache_exceptions, type):
+            cache_exceptions = (cache_exceptions, )
+        if cache_exceptions and not self.portable:
+            raise ValueError("cache_exceptions can only be used with plain methods, properties and functions")
+        if exception_ttl is not None and (not cache_exceptions or exception_ttl <= 0):
+            raise ValueError("exception_ttl must be positive, and needs cache_exceptions, got %r" % (exception_ttl, ))
         self._fun = fun
+        self.name = _qualified_name(fun)
+        self._backend = backend
+        self._object_cache = OBJECT_STORAGE[storage]
+        self._key = key
+        self._batch = batch
+        self._sizeof = estimate_size if sizeof is None else sizeof
+        self._budgeted = self.portable and backend is None
+        self._tracked = fun.__dict__.get(TRACKED_DEPENDENCIES, ())
+        self.maxsize = maxsize
+        self.policy = policy
+        self.ttl = ttl
+        if clock is None:
+            # Backend entries outlive the process, so need a clock that does too
+            clock = _monotonic if backend is None else time.time
+        self._clock = clock
+        self.threadsafe = threadsafe
+        self._lock = threading.RLock()
+        self._in_flight = {}  # (id(store), key) -> _Flight, only used when threadsafe
+        self.cache_exceptions = tuple(cache_exceptions)
+        self.exception_ttl = exception_ttl
+        self.refresh = refresh
+        self._refreshing = set()  # (id(store), key) of the expired entries being refreshed in the background
+        self.refresh_errors = 0
+        self.timed = timed
+        if isinstance(tags, str):
+            tags = (tags, )
+        self.tags = tuple(tags)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compute_time = 0.0
+        self.timed_calls = 0
+        self._stores = weakref.WeakValueDictionary()  # id(store) -> store, for every in-process store
+        _ALL_CACHES.add(self)
+        if ttl is not None:
+            _EXPIRING_CACHES.add(self)
+        for tag in self.tags:
+            _TAGGED_CACHES.setdefault(tag, weakref.WeakSet()).add(self)
+
+    def _evicted_from(self, store_ref, key, value):
+        # Stores hold a weak reference to themselves, rather than a cycle, so are freed as soon as they are dropped
+        self._evicted(store_ref(), key, value)
+
+    def _evicted(self, store, key, value):
+        self.evictions += 1
+        if _BUDGET is not None:
+            _BUDGET.forget(store, key)
+
+    def _evict(self, store, key):
+        # Called by the memory budget, which has already stopped counting the entry
+        with self._lock:
+            if store.pop(key, MISSING) is not MISSING:
+                self.evictions += 1
+                if _BUDGET is not None:
+                    # In case the result was saved again since the budget chose it
+                    _BUDGET.forget(store, key)
+
+    def _new_store(self, local=False):
+        if self._backend is not None and not local:
+            return self._backend.store(self.name)
+        if self.maxsize is None:
+            store = DictStore()
+        else:
+            store = EVICTION_POLICIES[self.policy](self.maxsize)
+            store.on_evict = functools.partial(self._evicted_from, weakref.ref(store))
+        self._stores[id(store)] = store
+        return store
 
     def get_cache(self, obj):
-        if not _hasattr(obj, CACHE_KEY):
-            setattr(obj, CACHE_KEY, {})
-        cache = getattr(obj, CACHE_KEY)
-        if self._fun not in cache:
-            cache[self._fun] = ({}, [])
-        return cache[self._fun]
+        if _ACTIVE_SCOPES:
+            scope = _current_scope()
+            if scope is not None:
+                store = scope.existing_store(self, obj)
+                if store is None:
+                    if self._tracked:
+                        self._track(obj, self._object_cache(obj, True))
+                    store = scope.get_store(self, obj)
+                return store
+        cache = self._object_cache(obj, True)
+        store = cache.get(self._fun)
+        if store is None:
+            if self._tracked:
+                self._track(obj, cache)
+            store = cache[self._fun] = self._new_store()
+        return store
+
+    def _track(self, obj, cache):
+        _check_tracked(self.name, obj)
+        dependants = cache.setdefault(DEPENDANTS, {})
+        for name in self._tracked:
+            dependants.setdefault(name, set()).add(self)
+
+    def _values(self):
+        for store in list(self._stores.values()):
+            for _, entry in list(store.items()) + list(store.unhashable):
+                yield entry if self.ttl is None else entry[0]
+
+    def cache_info(self):
+        """
+        Returns a ``CacheInfo`` of the hits, misses and evictions so far, along with the number of ``entries``
+        currently cached, the approximate ``bytes`` they take up (not counting backends), and, if created with
+        ``timed=True`` (or while there is a memory budget), an estimate of the seconds of computation the hits have
+        saved (otherwise ``None``).
+        Counts cover every object the cache has been used on.
+        """
+        entries = 0
+        num_bytes = 0
+        for value in self._values():
+            entries += 1
+            num_bytes += self._sizeof(value)
+        if self._backend is not None:
+            entries += len(self._backend.store(self.name))
+        time_saved = None
+        if self.timed_calls:
+            time_saved = self.hits * (self.compute_time / self.timed_calls)
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, entries, num_bytes, time_saved)
 
     def reset(self, obj):
-        if self.has_cached(obj):
-            del getattr(obj, CACHE_KEY)[self._fun]
+        with self._lock:
+            if _ACTIVE_SCOPES:
+                scope = _current_scope()
+                if scope is not None:
+                    scope.discard(self, obj)
+            if self._backend is not None:
+                # Results are shared, so forgetting them for one object forgets them for all
+                self._new_store().clear()
+            cache = self._object_cache(obj, False)
+            store = None if cache is None else cache.pop(self._fun, None)
+            if store is not None and _BUDGET is not None:
+                _BUDGET.forget_store(id(store))
+        _invalidate_dependants(obj, self._fun.__name__)
+
+    def clear(self):
+        """
+        Forgets every cached result, for all objects.
+        """
+        with self._lock:
+            for store in list(self._stores.values()):
+                store.clear()
+                del store.unhashable[:]
+                if _BUDGET is not None:
+                    _BUDGET.forget_store(id(store))
+            if self._backend is not None:
+                self._new_store().clear()
 
     @contextlib.contextmanager
     def temporary_cache(self, obj):
-        old_cache = self.get_cache(obj)
+        scope = _current_scope() if _ACTIVE_SCOPES else None
+        if scope is not None:
+            with self._lock:
+                old_entry = scope.replace_store(self, obj, self._new_store(local=True))
+            try:
+                yield
+            finally:
+                with self._lock:
+                    scope.restore_store(self, obj, old_entry)
+            return
+        with self._lock:
+            old_cache = self.get_cache(obj)
+            self._object_cache(obj, True)[self._fun] = self._new_store(local=True)
         try:
-            getattr(obj, CACHE_KEY)[self._fun] = ({}, [])
             yield
         finally:
-            getattr(obj, CACHE_KEY)[self._fun] = old_cache
+            with self._lock:
+                self._object_cache(obj, True)[self._fun] = old_cache
 
     def has_cached(self, obj):
-        return _hasattr(obj, CACHE_KEY) and self._fun in getattr(obj, CACHE_KEY)
+        if self._backend is not None and not (_ACTIVE_SCOPES and _current_scope() is not None):
+            return len(self.get_cache(obj)) > 0
+        store = self._existing_store(obj)
+        # Stores emptied by clear() are left in place
+        return store is not None and (len(store) > 0 or len(store.unhashable) > 0)
+
+    def _existing_store(self, obj):
+        if _ACTIVE_SCOPES:
+            scope = _current_scope()
+            if scope is not None:
+                return scope.existing_store(self, obj)
+        cache = self._object_cache(obj, False)
+        return cache.get(self._fun) if cache is not None else None
 
     def _run(self, obj, args, kwargs):
         return self._fun(obj, *args, **kwargs)
 
+    def _find_unhashable(self, store, arg_key):
+        for cached_key, entry in store.unhashable:
+            if cached_key == arg_key:
+                return entry
+        return MISSING
+
+    def _discard(self, store, arg_key, hashable):
+        if hashable:
+            store.pop(arg_key, None)
+            if _BUDGET is not None:
+                _BUDGET.forget(store, arg_key)
+        else:
+            store.unhashable[:] = [item for item in store.unhashable if item[0] != arg_key]
+
+    def _lookup(self, store, arg_key, hashable):
+        if hashable:
+            entry = store.get(arg_key, MISSING)
+        else:
+            entry = self._find_unhashable(store, arg_key)
+        if entry is MISSING:
+            return MISSING
+        if _BUDGET is not None and hashable:
+            _BUDGET.hit(store, arg_key)
+        if self.ttl is None:
+            result = entry
+        else:
+            result, expires = entry
+            if expires <= self._clock():
+                if self.refresh is None or not hashable:
+                    self._discard(store, arg_key, hashable)
+                return MISSING
+        if (self.exception_ttl is not None and isinstance(result, _CachedError)
+                and result.expires <= self._clock()):
+            self._discard(store, arg_key, hashable)
+            return MISSING
+        self.hits += 1
+        return result
+
+    def _save(self, store, arg_key, hashable, result):
+        entry = result if self.ttl is None else (result, self._clock() + self.ttl)
+        self._put(store, arg_key, hashable, entry)
+
+    def _put(self, store, arg_key, hashable, entry):
+        if hashable:
+            store[arg_key] = entry
+            if _BUDGET is not None and self._budgeted:
+                _BUDGET.charge(self, store, arg_key, entry)
+        else:
+            store.unhashable.append((copy.deepcopy(arg_key), entry))
+            if self.maxsize is not None and len(store.unhashable) > self.maxsize:
+                old_key, old_entry = store.unhashable.pop(0)
+                self.evictions += 1
+
     def _get_result(self, obj, args, kwargs):
-        dict_cache, list_cache = self.get_cache(obj)
-        arg_key = (self.get_dependencies(obj), args, tuple(kwargs.items()))
+        arg_key = self.make_key(obj, args, kwargs)
         try:
             hash(arg_key)
             hashable = True
         except TypeError:
-            hashable = False
-        if hashable and arg_key in dict_cache:
-            return dict_cache[arg_key]
-        elif not hashable:
-            for cached_key, result in list_cache:
-                if cached_key == arg_key:
-                    return result
-        result = self._run(obj, args, kwargs)
-        if hashable:
-            dict_cache[arg_key] = result
+            arg_key, hashable = _hashable_key(arg_key)
+        if self.threadsafe:
+            result = self._get_result_threadsafe(obj, args, kwargs, arg_key, hashable)
         else:
-            list_cache.append((copy.deepcopy(arg_key), result))
+            # Entries with a ttl can be removed by the sweeper, or replaced by a refresh, from other threads
+            lock = self._lock if self.ttl is not None else _NO_LOCK
+            with lock:
+                store = self.get_cache(obj)
+                result = self._lookup(store, arg_key, hashable)
+                if result is MISSING and self.refresh is not None and hashable:
+                    result = self._serve_stale(obj, args, kwargs, store, arg_key)
+            if result is MISSING:
+                self.misses += 1
+                try:
+                    result = self._compute(obj, args, kwargs)
+                except self.cache_exceptions as e:
+                    with lock:
+                        self._save(store, arg_key, hashable, self._cached_error(e))
+                    raise
+                with lock:
+                    self._save(store, arg_key, hashable, result)
+                if _BUDGET is not None:
+                    _BUDGET.enforce()
+        if self.cache_exceptions and isinstance(result, _CachedError):
+            result.reraise()
+        return result
+
+    def _cached_error(self, error):
+        return _CachedError(error, None if self.exception_ttl is None else self._clock() + self.exception_ttl)
+
+    def _compute(self, obj, args, kwargs):
+        # Misses are also timed when there is a memory budget, which weighs entries by how long they took to compute
+        if not self.timed and _BUDGET is None:
+            return self._run(obj, args, kwargs)
+        start = _perf_counter()
+        try:
+            return self._run(obj, args, kwargs)
+        finally:
+            self.compute_time += _perf_counter() - start
+            self.timed_calls += 1
+
+    def _get_result_threadsafe(self, obj, args, kwargs, arg_key, hashable):
+        # The first thread to miss on a key computes it, any others that ask for the same key meanwhile
+        # wait for that result instead of computing it again.  Different keys are computed in parallel.
+        with self._lock:
+            store = self.get_cache(obj)
+            result = self._lookup(store, arg_key, hashable)
+            if result is MISSING and self.refresh is not None and hashable:
+                result = self._serve_stale(obj, args, kwargs, store, arg_key)
+            if result is not MISSING:
+                return result
+            self.misses += 1
+            flight_key = (id(store), arg_key) if hashable else None
+            flight = self._in_flight.get(flight_key) if hashable else None
+            leader = flight is None or flight.owner == _get_ident()
+            if leader and hashable:
+                flight = self._in_flight[flight_key] = _Flight()
+        if not leader:
+            return flight.wait()
+        try:
+            result = self._compute(obj, args, kwargs)
+        except BaseException as e:
+            # Threads already waiting raise it as it is, later callers get it from the cache
+            cached = self._cached_error(e) if isinstance(e, self.cache_exceptions) else None
+            with self._lock:
+                if cached is not None:
+                    self._save(store, arg_key, hashable, cached)
+                if hashable:
+                    self._in_flight.pop(flight_key, None)
+            if hashable:
+                flight.fail(e)
+            raise
+        with self._lock:
+            self._save(store, arg_key, hashable, result)
+            if hashable:
+                self._in_flight.pop(flight_key, None)
+        if hashable:
+            flight.succeed(result)
+        if _BUDGET is not None:
+            _BUDGET.enforce()
         return result
 
+    def _serve_stale(self, obj, args, kwargs, store, arg_key):
+        # Returns an expired result, if there is one, making sure it is being recomputed
+        with self._lock:
+            entry = store.get(arg_key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            refresh_key = (id(store), arg_key)
+            if refresh_key not in self._refreshing:
+                self._refreshing.add(refresh_key)
+                self._start_refresh(obj, args, kwargs, functools.partial(self._refreshed, store, arg_key))
+            self.hits += 1
+            return entry[0]
+
+    def _start_refresh(self, obj, args, kwargs, done):
+        def run():
+            try:
+                result = self._compute(obj, args, kwargs)
+            except Exception:
+                result = MISSING
+            done(result)
+        thread = threading.Thread(target=run, name="fin.cache refresh %s" % self.name)
+        thread.daemon = True
+        thread.start()
+
+    def _refreshed(self, store, arg_key, result):
+        with self._lock:
+            self._refreshing.discard((id(store), arg_key))
+            if result is not MISSING:
+                self._save(store, arg_key, True, result)
+                return
+            # The refresh failed, so keep the last good result for another ttl before trying again
+            self.refresh_errors += 1
+            entry = store.get(arg_key, MISSING)
+            if entry is not MISSING:
+                store[arg_key] = (entry[0], self._clock() + self.ttl)
+
+    def expire(self):
+        """
+        Removes every expired entry, for all objects, returning the number of entries removed.
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            return self._expire(self._clock())
+
+    def _expire(self, now):
+        removed = 0
+        stores = list(self._stores.values())
+        if self._backend is not None:
+            stores.append(self._backend.store(self.name))
+        for store in stores:
+            for key, (_, expires) in list(store.items()):
+                if expires <= now:
+                    self._discard(store, key, True)
+                    removed += 1
+            fresh = [item for item in store.unhashable if item[1][1] > now]
+            removed += len(store.unhashable) - len(fresh)
+            store.unhashable[:] = fresh
+        return removed
+
     def get_result(self, obj, args, kwargs):
         return self._get_result(obj, args, kwargs)
 
+    def make_key(self, obj, args, kwargs):
+        return self._make_key(self.get_dependencies(obj), args, kwargs)
+
+    def _make_key(self, dependencies, args, kwargs):
+        if self._key is not None:
+            return (dependencies, self._key(*args, **kwargs))
+        return (dependencies, args, tuple(kwargs.items()))
+
+    def many(self, obj, arguments):
+        """
+        Returns a list of the results of calling the method with each item of ``arguments`` as its only argument.  Dependencies
+        are read once, for the whole batch, and if the cache has a ``batch`` function, all the misses are computed with a
+        single call to it.
+        """
+        dependencies = self.get_dependencies(obj)
+        results = []
+        misses = collections.OrderedDict()  # key -> (argument, [positions in results])
+        unhashable_misses = []  # (position, argument, key)
+        with self._lock if self.threadsafe or self.ttl is not None else _NO_LOCK:
+            store = self.get_cache(obj)
+            for position, argument in enumerate(arguments):
+                arg_key = self._make_key(dependencies, (argument, ), {})
+                try:
+                    hash(arg_key)
+                    hashable = True
+                except TypeError:
+                    arg_key, hashable = _hashable_key(arg_key)
+                result = self._lookup(store, arg_key, hashable)
+                if result is MISSING:
+                    if hashable:
+                        misses.setdefault(arg_key, (argument, []))[1].append(position)
+                    else:
+                        unhashable_misses.append((position, argument, arg_key))
+                results.append(result)
+        to_compute = [(arg_key, True, argument, positions) for arg_key, (argument, positions) in misses.items()]
+        to_compute.extend((arg_key, False, argument, [position]) for position, argument, arg_key in unhashable_misses)
+        errors = {}
+        if to_compute:
+            self.misses += len(to_compute)
+            computed, errors = self._compute_many(obj, [argument for _, _, argument, _ in to_compute])
+            with self._lock if self.threadsafe or self.ttl is not None else _NO_LOCK:
+                for (arg_key, hashable, _, positions), result in zip(to_compute, computed):
+                    self._save(store, arg_key, hashable, result)
+                    for position in positions:
+                        results[position] = result
+            if _BUDGET is not None:
+                _BUDGET.enforce()
+        if self.cache_exceptions:
+            for result in results:
+                if isinstance(result, _CachedError):
+                    if id(result) in errors:
+                        # Computed just now, so raise the original
+                        raise errors[id(result)]
+                    result.reraise()
+        return results
+
+    def _compute_many(self, obj, arguments):
+        """
+        Returns the results for ``arguments``, and a dict mapping the id of the _CachedError standing in for each
+        result that raised one of ``cache_exceptions`` to the exception that was raised
+        """
+        errors = {}
+        if self._batch is None:
+            results = []
+            for argument in arguments:
+                try:
+                    results.append(self._compute(obj, (argument, ), {}))
+                except self.cache_exceptions as e:
+                    results.append(self._cached_error(e))
+                    errors[id(results[-1])] = e
+            return results, errors
+        start = _perf_counter()
+        results = list(self._batch(obj, arguments))
+        if len(results) != len(arguments):
+            raise ValueError("batch function for %s returned %s results for %s arguments"
+                             % (self.name, len(results), len(arguments)))
+        if self.timed or _BUDGET is not None:
+            self.compute_time += _perf_counter() - start
+            self.timed_calls += len(arguments)
+        return results, errors
+
     def get_dependencies(self, obj):
         dependencies = self._fun.__dict__.get(DEPENDENCIES)
         if dependencies is None:
@@ -83,19 +1235,220 @@ class ResultCache(object):
 
 class GeneratorCache(ResultCache):
 
+    _start_refresh = None
+
+    def __init__(self, fun, bounded=False, spill=False, chunk_size=1024, batch_size=1, prefetch=0, **options):
+        super(GeneratorCache, self).__init__(fun, **options)
+        self._tee_options = dict(bounded=bounded, spill=spill, chunk_size=chunk_size, batch_size=batch_size,
+                                 prefetch=prefetch)
+
+    many = None
+    portable = False
+
     def _run(self, obj, args, kwargs):
-        return DynamicTee(self._fun(obj, *args, **kwargs))
+        return DynamicTee(self._fun(obj, *args, **kwargs), **self._tee_options)
+
+    def _lookup(self, store, arg_key, hashable):
+        tee = super(GeneratorCache, self)._lookup(store, arg_key, hashable)
+        if tee is not MISSING and not tee.can_replay():
+            # A bounded tee that has already released its first values, so start again
+            self.hits -= 1
+            self._discard(store, arg_key, hashable)
+            return MISSING
+        return tee
 
     def get_result(self, obj, args, kwargs):
         return self._get_result(obj, args, kwargs).get_copy()
 
 
+class CoroutineCache(ResultCache):
+
+    """
+    Caches the result of a coroutine function as a task, so that the result can be awaited any number of
+    times, and concurrent callers share a single run.  Tasks that fail, or are cancelled, are dropped from the cache.
+    """
+
+    many = None
+    portable = False
+
+    def _run(self, obj, args, kwargs):
+        return asyncio.ensure_future(self._fun(obj, *args, **kwargs))
+
+    def _save(self, store, arg_key, hashable, result):
+        super(CoroutineCache, self)._save(store, arg_key, hashable, result)
+        result.add_done_callback(functools.partial(self._forget_failure, store, arg_key, hashable))
+
+    def _start_refresh(self, obj, args, kwargs, done):
+        # The new task runs in the background by itself, and replaces the old one once it has succeeded
+        task = self._compute(obj, args, kwargs)
+        task.add_done_callback(lambda task: done(task if not task.cancelled() and task.exception() is None else MISSING))
+
+    def _forget_failure(self, store, arg_key, hashable, task):
+        if not task.cancelled() and task.exception() is None:
+            return
+        with self._lock:
+            entry = store.get(arg_key, None) if hashable else self._find_unhashable(store, arg_key)
+            if self.ttl is not None and entry is not MISSING and entry is not None:
+                entry = entry[0]
+            if entry is task or not hashable:
+                self._discard(store, arg_key, hashable)
+
+    def get_result(self, obj, args, kwargs):
+        # Shielded, so that one cancelled caller doesn't cancel the shared task for everyone else
+        return asyncio.shield(self._get_result(obj, args, kwargs))
+
+
+def _positional_parameters(fun):
+    """
+    Returns the number of parameters ``fun`` has, if they can all be passed positionally (so no keyword-only
+    parameters, ``*args`` or ``**kwargs``), otherwise None
+    """
+    if _signature is None:
+        return None
+    try:
+        # Not the signature of any function fun wraps, as fun may well take different arguments
+        parameters = list(_signature(fun, follow_wrapped=False).parameters.values())
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if all(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD) for parameter in parameters):
+        return len(parameters)
+    return None
+
+
+def _make_binder(fun):
+    """
+    Returns a function taking ``(args, kwargs)`` for a call to ``fun``, and returning a key that is the same for every
+    call that passes the same values, however they are passed
+    """
+    if _signature is None:
+        def bind_callargs(args, kwargs):
+            return tuple(sorted(inspect.getcallargs(fun, *args, **kwargs).items(), key=lambda item: item[0]))
+        return bind_callargs
+
+    signature = _signature(fun, follow_wrapped=False)
+    num_parameters = _positional_parameters(fun)
+    simple = num_parameters is not None
+
+    def bind(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if simple:
+            return bound.args
+        return (bound.args, tuple(sorted(bound.kwargs.items(), key=lambda item: item[0])))
+
+    if not simple:
+        return bind
+
+    def bind_simple(args, kwargs):
+        # Calls passing every argument positionally are already normalised
+        if not kwargs and len(args) == num_parameters:
+            return args
+        return bind(args, kwargs)
+    return bind_simple
+
+
+class FunctionCache(ResultCache):
+
+    """
+    Caches the results of a plain function, in a single store shared by the whole process, see :func:`fin.cache.function`
+    """
+
+    def __init__(self, fun, **options):
+        super(FunctionCache, self).__init__(fun, **options)
+        if DEPENDENCIES in fun.__dict__ or self._tracked:
+            raise ValueError("%s: functions have no object for @fin.cache.depends() to read, use @fin.cache.method" % self.name)
+        self._bind = _make_binder(fun)
+        self._num_parameters = _positional_parameters(fun)
+        self._store = None
+        if self._batch is not None:
+            batch = self._batch
+            self._batch = lambda obj, arguments: batch(arguments)
+
+    def _run(self, obj, args, kwargs):
+        return self._fun(*args, **kwargs)
+
+    def get_cache(self, obj):
+        if _ACTIVE_SCOPES:
+            scope = _current_scope()
+            if scope is not None:
+                return scope.get_store(self, None)
+        store = self._store
+        if store is None:
+            store = self._store = self._new_store()
+        return store
+
+    def _existing_store(self, obj):
+        if _ACTIVE_SCOPES:
+            scope = _current_scope()
+            if scope is not None:
+                return scope.existing_store(self, None)
+        return self._store
+
+    def get_dependencies(self, obj):
+        return None
+
+    def _make_key(self, dependencies, args, kwargs):
+        if self._key is not None:
+            return self._key(*args, **kwargs)
+        return self._bind(args, kwargs)
+
+    def reset(self, obj=None):
+        with self._lock:
+            if _ACTIVE_SCOPES:
+                scope = _current_scope()
+                if scope is not None:
+                    scope.discard(self, None)
+            if self._backend is not None:
+                self._new_store().clear()
+            self._store = None
+
+    def has_cached(self, obj=None):
+        return super(FunctionCache, self).has_cached(obj)
+
+    @contextlib.contextmanager
+    def temporary_cache(self, obj=None):
+        scope = _current_scope() if _ACTIVE_SCOPES else None
+        if scope is not None:
+            with self._lock:
+                old_entry = scope.replace_store(self, None, self._new_store(local=True))
+            try:
+                yield
+            finally:
+                with self._lock:
+                    scope.restore_store(self, None, old_entry)
+            return
+        with self._lock:
+            old_store = self.get_cache(None)
+            self._store = self._new_store(local=True)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._store = old_store
+
+    def many(self, arguments):
+        return super(FunctionCache, self).many(None, arguments)
+
+
 class DynamicTee(object):
 
     """
     Wraps a generator, and keeps a reference to all generated values.  calling get_copy() on a DynamicTee object creates an iterator
     that behaves as it it were a it were a fresh iterator over the same values.
 
+    With ``bounded=True``, values are released, ``chunk_size`` at a time, once every live copy has read past them.  Copies made
+    after that can't start from the beginning (see ``can_replay()``), unless ``spill=True``, in which case released chunks
+    are pickled to a temporary file, and read back from there when needed.
+
+    Copies can be read from different threads (each copy should only be used by one thread).  Values that have already been
+    generated are read without locking, while advancing the wrapped generator is done under a lock, ``batch_size`` values at a
+    time, to reduce the number of times it has to be taken.
+
+    With ``prefetch=N``, the wrapped generator is advanced by a background thread instead, staying up to ``N`` values ahead of
+    the furthest-along copy, so that slow (I/O bound) generators produce values while the copies are being consumed.  The
+    thread exits once it has been waiting for ``prefetch_idle_timeout`` seconds without any copy asking for more, and a
+    new one is started when one does, so tees that are kept (e.g. in a cache) but not read don't each hold on to a thread.
+
     Example::
     
         >> i = iter([1,2,3,4])
@@ -122,24 +1475,272 @@ class DynamicTee(object):
         def __iter__(self):
             return self
 
-    def __init__(self, generator):
+    prefetch_idle_timeout = 5
+
+    def __init__(self, generator, bounded=False, spill=False, chunk_size=1024, batch_size=1, prefetch=0):
         self._stopped = False
+        self._error = None
+        self._batch_size = batch_size
+        self._prefetch = prefetch
+        self._prefetcher = None
+        self._requested = 0  # One past the highest index asked for so far, used when prefetching
+        self._idle_since = None  # When the prefetch thread started waiting for readers to catch up
+        self._lock = threading.Condition() if prefetch else threading.Lock()
         if not hasattr(generator, "__next__"):
             self._generator = iter(generator)
         else:
             self._generator = generator
         self._generated = []
-        
+        self._offset = 0  # The index of self._generated[0]
+        self._bounded = bounded
+        self._chunk_size = chunk_size
+        self._next_trim = 2 * chunk_size
+        self._readers = weakref.WeakSet()
+        self._spill = spill
+        self._spill_file = None
+        self._spilled = []  # Start index of each spilled chunk
+        self._spilled_positions = []  # Position in the spill file of each spilled chunk
+        self._loaded = (None, None)  # The most recently read spilled chunk: (start index, values)
+
     def get_copy(self):
-        return self.TeeGenerator(self)
+        reader = self.TeeGenerator(self)
+        if self._bounded:
+            self._readers.add(reader)
+        return reader
+
+    def can_replay(self):
+        return self._offset == 0 or self._spill
 
     def __getitem__(self, index):
-        if index == len(self._generated):
-            self._generated.append(next(self._generator))
-        return self._generated[index]
+        if not self._bounded:
+            # Unbounded tees only ever append, so generated values can be read without the lock.  When prefetching, the
+            # furthest-along copy still takes it, to let the prefetch thread know it can move further ahead
+            generated = self._generated
+            if index < len(generated) and (not self._prefetch or index < self._requested):
+                return generated[index]
+        with self._lock:
+            return self._get(index)
+
+    def _get(self, index):
+        if self._prefetch:
+            return self._get_prefetched(index)
+        position = index - self._offset
+        if position == len(self._generated):
+            if self._stopped:
+                raise StopIteration()
+            if self._batch_size == 1:
+                try:
+                    self._generated.append(next(self._generator))
+                except StopIteration:
+                    self._stopped = True
+                    raise
+            else:
+                self._generated.extend(itertools.islice(self._generator, self._batch_size))
+                if position == len(self._generated):
+                    self._stopped = True
+                    raise StopIteration()
+            if self._bounded and index >= self._next_trim:
+                self._trim()
+                position = index - self._offset
+        if position < 0:
+            return self._read_spilled(index)
+        return self._generated[position]
+
+    def _get_prefetched(self, index):
+        if self._prefetcher is None:
+            self._prefetcher = threading.Thread(target=_prefetch_worker, args=(weakref.ref(self), ),
+                                                name="fin.cache.DynamicTee prefetch")
+            self._prefetcher.daemon = True
+            self._prefetcher.start()
+        if index >= self._requested:
+            self._requested = index + 1
+            self._lock.notify_all()
+        while index - self._offset >= len(self._generated):
+            if self._stopped:
+                if self._error is not None:
+                    raise self._error
+                raise StopIteration()
+            self._lock.wait()
+        if index < self._offset:
+            return self._read_spilled(index)
+        return self._generated[index - self._offset]
+
+    def _prefetch_step(self):
+        """
+        Called repeatedly by the prefetch thread, returns False once there is nothing more to do
+        """
+        with self._lock:
+            if self._stopped:
+                return False
+            if self._offset + len(self._generated) >= self._requested + self._prefetch:
+                # Far enough ahead, wait for a reader to catch up.  The timeout lets the thread notice
+                # if the tee has been garbage collected, or has gone unread for long enough to stop
+                now = _monotonic()
+                if self._idle_since is None:
+                    self._idle_since = now
+                elif now - self._idle_since >= self.prefetch_idle_timeout:
+                    # _get_prefetched starts another thread when there is more to do
+                    self._idle_since = None
+                    self._prefetcher = None
+                    return False
+                self._lock.wait(min(0.5, self.prefetch_idle_timeout))
+                return True
+            self._idle_since = None
+        # The generator is only ever advanced by this thread, so doesn't need the lock
+        try:
+            values = list(itertools.islice(self._generator, self._batch_size))
+        except BaseException as e:
+            with self._lock:
+                self._error = e
+                self._stopped = True
+                self._lock.notify_all()
+            return False
+        with self._lock:
+            self._generated.extend(values)
+            if not values:
+                self._stopped = True
+            if self._bounded and self._offset + len(self._generated) > self._next_trim:
+                self._trim()
+            self._lock.notify_all()
+        return bool(values)
+
+    def _trim(self):
+        self._next_trim += self._chunk_size
+        indexes = [reader.index for reader in list(self._readers)]
+        oldest = min(indexes) if indexes else self._offset + len(self._generated)
+        num_chunks = (oldest - self._offset) // self._chunk_size
+        for _ in range(num_chunks):
+            chunk = self._generated[:self._chunk_size]
+            del self._generated[:self._chunk_size]
+            if self._spill:
+                self._write_spilled(chunk)
+            self._offset += self._chunk_size
+
+    def _write_spilled(self, chunk):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+            if _finalize is not None:
+                # Closed (and so deleted) as soon as the tee is discarded, e.g. by resetting the cache holding it
+                _finalize(self, self._spill_file.close)
+        self._spill_file.seek(0, 2)
+        self._spilled.append(self._offset)
+        self._spilled_positions.append(self._spill_file.tell())
+        pickle.dump(chunk, self._spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _read_spilled(self, index):
+        if not self._spilled or index < 0:
+            raise IndexError("Value %s has been released from this bounded DynamicTee" % index)
+        chunk_num = bisect.bisect_right(self._spilled, index) - 1
+        start, values = self._loaded
+        if start != self._spilled[chunk_num]:
+            self._spill_file.seek(self._spilled_positions[chunk_num])
+            start, values = self._loaded = (self._spilled[chunk_num], pickle.load(self._spill_file))
+        return values[index - start]
+
+
+class AsyncGeneratorCache(ResultCache):
+
+    many = None
+    portable = False
+    _start_refresh = None
+
+    def __init__(self, fun, prefetch=0, **options):
+        super(AsyncGeneratorCache, self).__init__(fun, **options)
+        self._prefetch = prefetch
+
+    def _run(self, obj, args, kwargs):
+        return AsyncDynamicTee(self._fun(obj, *args, **kwargs), prefetch=self._prefetch)
+
+    def get_result(self, obj, args, kwargs):
+        return self._get_result(obj, args, kwargs).get_copy()
+
 
+def _copy_outcome(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+        if isinstance(source.exception(), StopAsyncIteration):
+            target.exception()  # Marks the exception as retrieved, the end of iteration isn't worth logging
+    else:
+        target.set_result(source.result())
 
-def depends(*attributes):
+
+class AsyncDynamicTee(object):
+
+    """
+    The ``async for`` equivalent of :class:`DynamicTee`.  Wraps an async generator, keeping every value it produces, and
+    ``get_copy()`` returns async iterators that each start from the beginning.  Any number of copies can be iterated
+    concurrently, and they share a single run of the wrapped generator.
+
+    Each value is held in a future, and fetching value ``n + 1`` starts only once value ``n`` has arrived, as async generators
+    can't be advanced concurrently.  With ``prefetch=N``, up to ``N`` values beyond the furthest-along copy are fetched in the
+    background.
+    """
+
+    class TeeGenerator(object):
+
+        def __init__(self, dynamic_tee):
+            self.tee = dynamic_tee
+            self.index = 0
+
+        def __anext__(self):
+            future = self.tee.get(self.index)
+            self.index += 1
+            # Shielded, so that cancelling one reader doesn't cancel the value for all the others
+            return asyncio.shield(future)
+
+        def __aiter__(self):
+            return self
+
+    def __init__(self, generator, prefetch=0):
+        self._generator = generator
+        self._prefetch = prefetch
+        self._futures = []
+
+    def get_copy(self):
+        return self.TeeGenerator(self)
+
+    def get(self, index):
+        """
+        Returns a future for the value at ``index``, once the wrapped generator is exhausted this fails with ``StopAsyncIteration``
+        """
+        while len(self._futures) <= index + self._prefetch:
+            if self._futures and self._futures[-1].done() and self._futures[-1].exception() is not None:
+                break  # The generator has finished, or failed, so there will never be more values
+            self._fetch_next()
+        return self._futures[min(index, len(self._futures) - 1)]
+
+    def _fetch_next(self):
+        loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)()
+        previous = self._futures[-1] if self._futures else None
+        future = loop.create_future()
+        self._futures.append(future)
+        if previous is None or previous.done():
+            self._start(future, previous)
+        else:
+            previous.add_done_callback(functools.partial(self._start, future))
+
+    def _start(self, future, previous):
+        if previous is not None and (previous.cancelled() or previous.exception() is not None):
+            _copy_outcome(previous, future)
+            return
+        task = asyncio.ensure_future(self._generator.__anext__())
+        task.add_done_callback(functools.partial(_copy_outcome, target=future))
+
+
+def _prefetch_worker(tee_ref):
+    # Only holds a weak reference between steps, so an abandoned tee can still be collected
+    while True:
+        tee = tee_ref()
+        if tee is None or not tee._prefetch_step():
+            return
+        del tee
+
+
+def depends(*attributes, **options):
     """
     Used in conjunction with :func:`fin.cache.property` or :func:`fin.cache.method`, this decorator tags a cached method as depending
     on the value of the specified named attribute on the method's object.  Note, this does mean all dependant properties are evaluated
@@ -175,28 +1776,129 @@ def depends(*attributes):
 
     In this case, ``instance.hash`` will always reflect the currently selected hashing method, and the current value, but will not re-hash the 
     value needlessly.
+
+    Passing ``tracked=True`` avoids reading the attributes on every call, and keeping a result for every combination of values seen.
+    Instead, the cached results are dropped whenever one of the attributes is assigned to, or deleted, which requires the class to
+    inherit from :class:`fin.cache.Tracked` (a TypeError is raised otherwise).  Resetting another cached method or property also counts as a change to it, so tracked
+    dependencies on other cached properties work.  Attributes that change without being assigned (such as plain ``@property`` values)
+    are not seen, so should not be tracked::
+
+        >>> class HashedValue(fin.cache.Tracked):
+
+        >>>    @fin.cache.property
+        >>>    @fin.cache.depends("value", "hash_method", tracked=True)
+        >>>    def hash(self):
+        >>>        return getattr(hashlib, self.hash_method)(self.value).hexdigest()
     """
+    tracked = options.pop("tracked", False)
+    if options:
+        raise TypeError("Unexpected options for depends(): %s" % ", ".join(sorted(options)))
     def mutate(fun):
-        fun.__dict__[DEPENDENCIES] = attributes
+        fun.__dict__[TRACKED_DEPENDENCIES if tracked else DEPENDENCIES] = attributes
         return fun
     return mutate
 
 
-def _wrap_fun_with_cache(fun, cache_type):
-    cache = cache_type(fun)
+class Tracked(object):
+
+    """
+    Base class for objects whose cached methods use ``@fin.cache.depends(..., tracked=True)``.  Assigning to, or deleting,
+    an attribute drops any cached results that depend on it.
+    """
+
+    def __setattr__(self, name, value):
+        super(Tracked, self).__setattr__(name, value)
+        _invalidate_dependants(self, name)
+
+    def __delattr__(self, name):
+        super(Tracked, self).__delattr__(name)
+        _invalidate_dependants(self, name)
 
-    @functools.wraps(fun)
-    def wrapper(obj, *args, **kwargs):
-        return cache.get_result(obj, args, kwargs)
 
-    for method_name in ['reset', 'has_cached', 'temporary_cache']:
+def _check_tracked(name, obj):
+    # Otherwise nothing would ever notice the attributes changing, and stale results would be returned
+    if not isinstance(obj, Tracked):
+        raise TypeError("%s uses tracked dependencies, so %s must inherit from fin.cache.Tracked"
+                        % (name, type(obj).__name__))
+
+
+def _expose_cache_methods(wrapper, cache):
+    for method_name in ['reset', 'clear', 'has_cached', 'temporary_cache', 'cache_info', 'expire', 'many']:
         bound_method = getattr(cache, method_name, None)
         if bound_method is not None:
             setattr(wrapper, method_name, bound_method)
     return wrapper
 
 
-def method(fun):
+def _can_specialise(cache):
+    # The specialised wrappers only know how to read plain, unbounded, dict stores, with keys built from the arguments alone
+    return (type(cache) in (ResultCache, FunctionCache) and cache._key is None and not cache.threadsafe and cache.ttl is None
+            and not cache.cache_exceptions and cache.maxsize is None and cache._backend is None and cache._object_cache is _instance_cache
+            and DEPENDENCIES not in cache._fun.__dict__)
+
+
+def _specialised_method_wrapper(fun, cache):
+    """
+    Returns a wrapper for the common case of a cached method with no options, that finds cached results in the object's
+    ``__dict__`` itself, building the same key as ``ResultCache.make_key`` would, but without the general purpose
+    machinery.  Misses, and anything unusual (keyword arguments, arguments that freeze() can't make hashable), go through ``cache.get_result``.
+    """
+    if _positional_parameters(fun) == 1:
+        # Nothing but the object (e.g. properties), so every call has the same key
+        key = (None, (), ())
+
+        @functools.wraps(fun)
+        def wrapper(obj):
+            if _ACTIVE_SCOPES:
+                return cache.get_result(obj, (), {})
+            try:
+                store = obj.__dict__[CACHE_KEY][fun]
+                result = store[key]
+            except (AttributeError, KeyError):
+                return cache.get_result(obj, (), {})
+            if _BUDGET is not None:
+                _BUDGET.hit(store, key)
+            cache.hits += 1
+            return result
+        return wrapper
+
+    @functools.wraps(fun)
+    def wrapper(obj, *args, **kwargs):
+        if kwargs or _ACTIVE_SCOPES:
+            return cache.get_result(obj, args, kwargs)
+        key = (None, args, ())
+        try:
+            store = obj.__dict__[CACHE_KEY][fun]
+            result = store[key]
+        except (AttributeError, KeyError):
+            return cache.get_result(obj, args, kwargs)
+        except TypeError:
+            # Unhashable arguments are stored under their frozen equivalent (the same key _hashable_key makes)
+            key = (None, _freeze(args), ())
+            try:
+                result = store[key]
+            except (KeyError, TypeError):
+                return cache.get_result(obj, args, kwargs)
+        if _BUDGET is not None:
+            _BUDGET.hit(store, key)
+        cache.hits += 1
+        return result
+    return wrapper
+
+
+def _wrap_fun_with_cache(fun, cache_type, **options):
+    cache = cache_type(fun, **options)
+    if _can_specialise(cache):
+        return _expose_cache_methods(_specialised_method_wrapper(fun, cache), cache)
+
+    @functools.wraps(fun)
+    def wrapper(obj, *args, **kwargs):
+        return cache.get_result(obj, args, kwargs)
+
+    return _expose_cache_methods(wrapper, cache)
+
+
+def method(fun=None, **options):
     """
     This is the core of ``fin.cache``.  Typically used as a decorator on class or instance methods.  
     When a method is decorated with this function, repeatedly calling it, on the same object, 
@@ -219,6 +1921,9 @@ def method(fun):
             factorial.factorial(i)
 
     \* **NOTE**: Arguments are tested by equality (``a==b`` not ``a is b``).  This can, in a very few situations, lead to unexpected results.
+      Unhashable arguments (lists, dicts, sets) are converted with :func:`fin.cache.freeze` so they are looked up as fast as
+      hashable ones.  To control the key yourself, pass ``key``, a function taking the method's arguments (not including
+      the object) and returning a hashable value: ``@fin.cache.method(key=lambda user, **options: user.id)``.
       Also, the result value is cached by reference.  If a cached method returns, for example, a ``list``, then any modifications to that list will 
       be shared amongst all return values, which can lead to some strange effects if mis-used::
 
@@ -243,21 +1948,175 @@ def method(fun):
         [0] [0, 1]
 
     When used on an instance method, rather than a classmethod, the object instance should be passed into reset.
+
+    By default, every distinct set of arguments is kept for the lifetime of the object.  Passing ``maxsize`` bounds the number
+    of results kept per object, discarding entries according to ``policy``, which is either ``"lru"`` (least recently used,
+    the default) or ``"lfu"`` (least frequently used)::
+
+        >>> class Lookup(object):
+
+        >>>     @fin.cache.method(maxsize=2, policy="lru")
+        >>>     def fetch(self, key):
+        >>>         return slow_fetch(key)
+
+    ``cache_info()`` on the decorated method reports the hits, misses and evictions seen so far, across all objects, as well as
+    the number, and approximate size, of the entries currently cached.  With ``timed=True``, each miss is timed, to estimate
+    how much computation the hits have saved.  :func:`fin.cache.stats` collects this for every cache::
+
+        >>> Lookup.fetch.cache_info()
+        CacheInfo(hits=12, misses=3, evictions=1, maxsize=2, entries=2, bytes=98, time_saved=None)
+
+    Cached methods are not thread-safe by default: two threads that miss on the same arguments will both call the method.
+    With ``threadsafe=True``, the cache is guarded by a lock, and concurrent calls with the same arguments wait for a single
+    call to finish and share its result (or exception), while calls with different arguments still run in parallel::
+
+        >>> class Client(object):
+
+        >>>     @fin.cache.method(threadsafe=True)
+        >>>     def lookup(self, name):
+        >>>         return slow_remote_lookup(name)
+
+    ``backend`` replaces the per-object storage with a shared store, such as :class:`fin.cache_backends.DiskBackend`,
+    which keeps results on disk, across processes and restarts, or :class:`fin.cache_backends.SharedMemoryBackend`, which
+    shares results between forked worker processes.  See :mod:`fin.cache_backends` for the details.
+
+    Results are normally stored in the object's ``__dict__``.  With ``storage="weak"``, they are instead held in a side
+    table, keyed on a weak reference to the object, and dropped when the object is garbage collected.  This works for
+    classes that use ``__slots__`` (as long as they include ``__weakref__``), and leaves the object untouched.  Results
+    must not refer back to the object, or it will never be collected::
+
+        >>> class Point(object):
+        >>>     __slots__ = ("x", "y", "__weakref__")
+
+        >>>     @fin.cache.method(storage="weak")
+        >>>     def distance(self, other):
+        >>>         return math.hypot(self.x - other.x, self.y - other.y)
+
+    To look up many arguments at once, call ``many(obj, arguments)``, which returns the results of calling the method with each
+    item of ``arguments``.  If given, ``batch`` is a function taking the object and a list of arguments, and returning a
+    list of their results, used to compute all of the misses in one go::
+
+        >>> class Users(object):
+
+        >>>     def _fetch_users(self, user_ids):
+        >>>         return self.db.fetch_many(user_ids)
+
+        >>>     @fin.cache.method(batch=_fetch_users)
+        >>>     def user(self, user_id):
+        >>>         return self.db.fetch(user_id)
+
+        >>> users.user.many(users, [1, 2, 3])   # One call to _fetch_users([1, 2, 3])
+        >>> users.user(2)                       # Cached
+
+    Results count towards the process-wide limit set by :func:`fin.cache.set_memory_budget`, if there is one, sized by
+    :func:`fin.cache.estimate_size`, or by ``sizeof``, a function taking a result and returning its size in bytes.
+
+    ``clear()`` on the decorated method forgets its results for every object.  ``tags`` is a tuple of names that
+    :func:`fin.cache.invalidate_tag` can use to reset many cached methods at once.
+
+    Passing ``ttl`` (in seconds) bounds how long a result is reused.  Expired results are discarded when next looked up,
+    or by calling ``expire()`` on the decorated method (or :func:`fin.cache.expire` for every cache, see
+    :func:`fin.cache.start_sweeper` to do this periodically).  ``clock`` replaces the time source, which is
+    ``time.monotonic`` by default::
+
+        >>> class Config(object):
+
+        >>>     @fin.cache.method(ttl=30)
+        >>>     def remote_setting(self, name):
+        >>>         return fetch_setting(name)
+
+    With ``refresh="background"`` (which needs a ``ttl``), an expired result is still returned straight away, while a single
+    background thread (or, for coroutines, a task) recomputes it, replacing the result once it succeeds.  If the refresh
+    fails, the old result is kept for another ``ttl`` before trying again.  Expired results removed by ``expire()`` are
+    gone, so the next call computes them as normal.
+
+    Exceptions are normally not cached, so a call that fails is run again next time.  ``cache_exceptions`` is an exception
+    class, or tuple of them, that are cached instead, and raised again by later calls with the same arguments, for
+    ``exception_ttl`` seconds if given (and never longer than ``ttl``).  The call that fails raises the exception as
+    usual, and later calls raise the same exception again, without the original traceback::
+
+        >>> class Directory(object):
+
+        >>>     @fin.cache.method(cache_exceptions=KeyError, exception_ttl=5)
+        >>>     def user(self, name):
+        >>>         return self.remote.lookup(name)   # Raises KeyError for unknown users
     """
-    return _wrap_fun_with_cache(fun, ResultCache)
+    if fun is None:
+        return functools.partial(method, **options)
+    return _wrap_fun_with_cache(fun, ResultCache, **options)
+
+def function(fun=None, **options):
+    """
+    Acts like ``@fin.cache.method``, but for plain functions (and static methods), keeping the results in one store
+    shared by the whole process::
+
+        >>> @fin.cache.function(maxsize=1000)
+        >>> def geocode(address, country="GB"):
+        >>>     return slow_geocoder(address, country)
+
+        >>> geocode("10 Downing St")
+        >>> geocode(address="10 Downing St", country="GB")   # Cached
+
+    Arguments are matched up to the function's signature, with defaults filled in, so calls that pass the same values in
+    different ways share one result.  The signature is read once, when the function is decorated, and calls that pass
+    every argument positionally skip the matching altogether.  The decorated function has ``reset()``, ``clear()``,
+    ``has_cached()``, ``temporary_cache()``, ``cache_info()``, ``expire()`` and ``many(arguments)``, none of which take
+    an object.  The other options of ``@fin.cache.method`` work the same, though ``depends`` does not (there is no object
+    to read the attributes from), and a ``batch`` function takes just the list of arguments.
+    """
+    if fun is None:
+        return functools.partial(function, **options)
+    cache = FunctionCache(fun, **options)
+    num_parameters = cache._num_parameters
+    if num_parameters is not None and _can_specialise(cache):
+        # Calls passing every argument positionally are keyed on the args tuple itself, see _make_binder
+        @functools.wraps(fun)
+        def wrapper(*args, **kwargs):
+            if kwargs or _ACTIVE_SCOPES or len(args) != num_parameters:
+                return cache.get_result(None, args, kwargs)
+            try:
+                store = cache._store
+                result = store[args]
+            except (KeyError, TypeError):
+                return cache.get_result(None, args, kwargs)
+            if _BUDGET is not None:
+                _BUDGET.hit(store, args)
+            cache.hits += 1
+            return result
+        return _expose_cache_methods(wrapper, cache)
+
+    @functools.wraps(fun)
+    def wrapper(*args, **kwargs):
+        return cache.get_result(None, args, kwargs)
+
+    return _expose_cache_methods(wrapper, cache)
+
 
 _classmethod = classmethod
 
-def classmethod(fun):
-    return _classmethod(_wrap_fun_with_cache(fun, ResultCache))
+def classmethod(fun=None, **options):
+    if fun is None:
+        return functools.partial(classmethod, **options)
+    return _classmethod(_wrap_fun_with_cache(fun, ResultCache, **options))
 
 
-def generator(fun):
+def generator(fun=None, **options):
     """
     **Use with care!** This generator keeps a reference to all generated values for the lifetime of the cache (unless manually cleared).
     Given that generators are often used to handle larger volumes of data, this may cause memory issues if used incorrectly.  This decorator
     is useful as a speed optimisation, but comes with a memory cost.
 
+    With ``bounded=True``, values are released once every live iterator returned by the method has read past them, so only
+    the gap between the slowest and fastest iterator is held in memory.  Calling the method again after values have been released
+    starts the generator again, unless ``spill=True`` is also given, in which case released values are written to a temporary
+    file, and replayed from there.  Values are released, and spilled, ``chunk_size`` (default 1024) at a time.
+
+    The returned iterators can be used from different threads.  ``batch_size`` makes the wrapped generator advance that many values
+    at a time, rather than one, cutting locking and call overhead for fast generators, at the cost of evaluating further ahead.
+
+    ``prefetch=N`` runs the wrapped generator in a background thread, up to ``N`` values ahead of the furthest-along iterator,
+    overlapping slow (e.g. paged API or file reading) generators with the code consuming them.
+
     Acts like ``@fin.cache.method`` but for methods that return a generator (or uses :keyword:yield).  Repeated calls to this method return an
     object that can be used to iterate over the generated values from the start::
 
@@ -295,7 +2154,82 @@ def generator(fun):
         0.60075   #  [(0, 0), (1, 1), (2, 2)]
 
     """
-    return _wrap_fun_with_cache(fun, GeneratorCache)
+    if fun is None:
+        return functools.partial(generator, **options)
+    return _wrap_fun_with_cache(fun, GeneratorCache, **options)
+
+
+def coroutine(fun=None, **options):
+    """
+    Acts like ``@fin.cache.method``, but for ``async def`` methods.  Calling the method returns an awaitable for the
+    cached result, which can be awaited as many times as needed.  While the first call is still running, other
+    callers with the same arguments await the same run, rather than starting their own::
+
+        >>> class Client(object):
+
+        >>>     @fin.cache.coroutine
+        >>>     async def fetch(self, url):
+        >>>         async with self.session.get(url) as response:
+        >>>             return await response.text()
+
+        >>> client = Client()
+        >>> await asyncio.gather(client.fetch(url), client.fetch(url))  # Fetched once
+
+    If the coroutine raises, or is cancelled, nothing is cached and the next call runs it again.  Cancelling
+    one caller does not cancel the run that other callers are waiting on.  ``reset``, ``has_cached`` and
+    ``temporary_cache`` behave as for ``@fin.cache.method``.  This must be called from a running event loop.
+    """
+    if fun is None:
+        return functools.partial(coroutine, **options)
+    return _wrap_fun_with_cache(fun, CoroutineCache, **options)
+
+
+def async_generator(fun=None, **options):
+    """
+    Acts like ``@fin.cache.generator``, but for async generators (``async def`` methods that ``yield``).  Each call returns
+    an async iterator over the cached values, from the start, and concurrent ``async for`` loops share a single run of the
+    generator::
+
+        >>> class Feed(object):
+
+        >>>     @fin.cache.async_generator
+        >>>     async def pages(self, url):
+        >>>         while url is not None:
+        >>>             page = await fetch_json(url)
+        >>>             yield page
+        >>>             url = page.get("next")
+
+        >>> feed = Feed()
+        >>> first = [page async for page in feed.pages(url)]    # Slow
+        >>> second = [page async for page in feed.pages(url)]   # Fast (already fetched)
+
+    ``prefetch=N`` keeps fetching up to ``N`` values ahead of the furthest-along loop.  ``reset`` and ``has_cached`` behave as for
+    ``@fin.cache.method``.  As with :func:`fin.cache.generator`, every value is kept until the cache is reset.
+    """
+    if fun is None:
+        return functools.partial(async_generator, **options)
+    return _wrap_fun_with_cache(fun, AsyncGeneratorCache, **options)
+
+
+def _qualified_name(fun):
+    """
+    Returns ``module.qualname`` for ``fun``, which names its cache in backends, snapshots and ``stats()``
+    """
+    qualname = getattr(fun, "__qualname__", None)
+    if qualname is None:
+        # Python 2 has no __qualname__, so that methods with the same name in different classes don't share a name,
+        # look for the class body that called into fin.cache, if there is one
+        qualname = fun.__name__
+        frame = sys._getframe(1)
+        while frame is not None and frame.f_globals is globals():
+            frame = frame.f_back
+        if frame is not None and "__module__" in frame.f_locals and frame.f_code.co_name != "<module>":
+            qualname = "%s.%s" % (frame.f_code.co_name, qualname)
+    return "%s.%s" % (getattr(fun, "__module__", None), qualname)
+
+
+def _is_coroutine_function(fun):
+    return asyncio is not None and asyncio.iscoroutinefunction(fun)
 
 
 class property(object):
@@ -333,12 +2267,38 @@ class property(object):
         >>> print(e.number, f.number, f.number)
         4 5 9
 
+    When used on an ``async def`` method, the property caches the result, as :func:`fin.cache.coroutine` does, so
+    ``await e.number`` can be repeated, and only runs the method once.
+
+    Options accepted by :func:`fin.cache.method`, such as ``maxsize``, can be given by calling the decorator::
+
+        >>> class Example(object):
+
+        >>>     @fin.cache.property(maxsize=1)
+        >>>     @fin.cache.depends("value")
+        >>>     def doubled(self):
+        >>>         return self.value * 2
+
+    ``fast=True`` returns a :class:`FastProperty` instead, which stores the value directly in the instance ``__dict__``, so that
+    once cached, reading the attribute costs the same as reading a plain attribute.
     """
 
-    def __init__(self, fun, wrapper=method):
-        self._method = wrapper(fun)
+    def __new__(cls, fun=None, wrapper=method, fast=False, **options):
+        if fun is None:
+            return functools.partial(cls, wrapper=wrapper, fast=fast, **options)
+        if fast:
+            if options or wrapper is not method:
+                raise TypeError("fast properties do not support options: %s" % ", ".join(sorted(options) or ["wrapper"]))
+            return FastProperty(fun)
+        return super(property, cls).__new__(cls)
+
+    def __init__(self, fun, wrapper=method, fast=False, **options):
+        if wrapper is method and _is_coroutine_function(fun):
+            wrapper = coroutine
+        self._method = wrapper(fun, **options) if options else wrapper(fun)
         self.__doc__ = getattr(fun, "__doc__", None)
         self.temporary_cache = self._method.temporary_cache
+        self.cache_info = getattr(self._method, "cache_info", None)
 
     def __get__(self, inst, cls):
         if inst is None:
@@ -387,6 +2347,359 @@ class property(object):
         return self._method.has_cached(inst)
 
 
+def stats():
+    """
+    Returns a dict of the ``cache_info()`` of every cached method, property and generator, keyed on the qualified name of the
+    decorated function::
+
+        >>> fin.cache.stats()
+        {'myapp.Lookup.fetch': CacheInfo(hits=12, misses=3, evictions=1, maxsize=2, entries=2, bytes=98, time_saved=None), ...}
+
+    Hits and misses are plain counters, so leaving caches enabled costs nothing extra.  Entries and bytes are counted when
+    this is called.  Functions defined more than once with the same name get ``#2``, ``#3``, ... suffixes.
+    """
+    infos = {}
+    for cache in sorted(_ALL_CACHES, key=lambda cache: cache.name):
+        name = cache.name
+        count = 1
+        while name in infos:
+            count += 1
+            name = "%s#%s" % (cache.name, count)
+        infos[name] = cache.cache_info()
+    return infos
+
+
+def expire():
+    """
+    Removes expired entries from every cache created with a ``ttl``, returning the number of entries removed.
+    Expired entries are never returned, this just frees the memory they hold.
+    """
+    return sum(cache.expire() for cache in list(_EXPIRING_CACHES))
+
+
+def set_memory_budget(max_bytes):
+    """
+    Limits the approximate number of bytes used by the results of every cached method and property in the process, returning
+    the :class:`MemoryBudget` that enforces it (or None, if ``max_bytes`` is None, which removes the limit)::
+
+        >>> budget = fin.cache.set_memory_budget(512 * 1024 * 1024)
+        >>> budget.used
+        0
+
+    Result sizes are estimated with :func:`fin.cache.estimate_size`, unless the cached method was given its own ``sizeof``
+    function.  When the total goes over budget, the results that are least valuable, for their size, are evicted, taking into
+    account how often each is used, and how long its method takes to run (see :class:`MemoryBudget`).
+
+    Only results saved after this is called are counted.  Generators, coroutines, results stored in a ``backend`` and results
+    for arguments that can't be hashed (even with :func:`fin.cache.freeze`) are not counted.  With no budget set, none of this
+    costs anything.
+    """
+    global _BUDGET
+    _BUDGET = None if max_bytes is None else MemoryBudget(max_bytes)
+    return _BUDGET
+
+
+def invalidate_tag(obj, tag):
+    """
+    Forgets the results of every cached method, property and generator created with ``tag`` in its ``tags``, for ``obj``,
+    or, if ``obj`` is None, for every object::
+
+        >>> class User(object):
+
+        >>>     @fin.cache.property(tags=("user", ))
+        >>>     def profile(self):
+        >>>         return fetch_profile(self.id)
+
+        >>>     @fin.cache.method(tags=("user", "permissions"))
+        >>>     def can(self, action):
+        >>>         return check_permission(self.id, action)
+
+        >>> fin.cache.invalidate_tag(user, "user")     # Resets both, for one user
+        >>> fin.cache.invalidate_tag(None, "user")     # Resets both, for all users
+
+    Tags are indexed, so this only visits the caches that have the tag.  Tracked dependencies are reset as with ``reset``
+    when ``obj`` is given, but not when clearing every object.
+    """
+    for cache in list(_TAGGED_CACHES.get(tag, ())):
+        if obj is None:
+            cache.clear()
+        else:
+            cache.reset(obj)
+
+
+class Sweeper(threading.Thread):
+
+    """
+    A daemon thread that calls :func:`fin.cache.expire` every ``interval`` seconds, until ``stop()`` is called.
+    """
+
+    def __init__(self, interval):
+        super(Sweeper, self).__init__(name="fin.cache.Sweeper")
+        self.daemon = True
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            expire()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_sweeper(interval=60):
+    """
+    Starts, and returns, a :class:`Sweeper` thread that periodically removes expired cache entries::
+
+        >>> sweeper = fin.cache.start_sweeper(interval=10)
+        >>> ...
+        >>> sweeper.stop()
+    """
+    sweeper = Sweeper(interval)
+    sweeper.start()
+    return sweeper
+
+
+SNAPSHOT_FORMAT = 1
+
+
+def _result_cache(attribute):
+    """
+    Returns the ResultCache behind a cached method, classmethod or property (bound or not), or None
+    """
+    attribute = getattr(attribute, "__func__", attribute)
+    attribute = getattr(attribute, "_method", attribute)
+    cache = getattr(getattr(attribute, "reset", None), "__self__", None)
+    return cache if isinstance(cache, ResultCache) else None
+
+
+def _caches_of(obj):
+    if isinstance(obj, types.ModuleType):
+        for attribute in list(vars(obj).values()):
+            cache = _result_cache(attribute)
+            if isinstance(cache, FunctionCache):
+                yield cache
+        return
+    cache = _result_cache(obj)
+    if isinstance(cache, FunctionCache):
+        yield cache
+        return
+    cls = obj if isinstance(obj, type) else type(obj)
+    seen = set()
+    for klass in cls.__mro__:
+        for attribute in list(vars(klass).values()):
+            cache = _result_cache(attribute)
+            if cache is not None and cache not in seen:
+                seen.add(cache)
+                yield cache
+
+
+def _source_hash(fun):
+    try:
+        source = inspect.getsource(fun).encode("utf-8")
+    except (IOError, TypeError):
+        code = fun.__code__
+        source = code.co_code + repr(code.co_consts).encode("utf-8")
+    return hashlib.sha1(source).hexdigest()
+
+
+def snapshot(obj, serializer=pickle):
+    """
+    Returns the results cached on ``obj`` by its ``@fin.cache.method`` and ``@fin.cache.property`` attributes (or
+    ``@fin.cache.classmethod`` ones, if ``obj`` is a class), serialized with ``serializer.dumps``, so that they can be
+    loaded into another object, possibly in another process, with :func:`fin.cache.restore`::
+
+        >>> data = fin.cache.snapshot(lookup)
+        >>> ...
+        >>> fin.cache.restore(Lookup(), data)
+
+    ``obj`` can also be a :func:`fin.cache.function`, or a module, to save the results of every cached function in it.
+
+    Results are tagged with the hash of the method's source, so a snapshot taken before the method changed is not restored.
+    Generators, coroutines and caches using a ``backend`` are skipped.  ``serializer`` is anything with ``dumps`` and
+    ``loads`` functions, by default :mod:`pickle`, so the results (and the method arguments) must be picklable.
+    """
+    caches = {}
+    for cache in _caches_of(obj):
+        if not cache.portable or cache._backend is not None:
+            continue
+        with cache._lock:
+            store = cache._existing_store(obj)
+            if store is None:
+                continue
+            now = cache._clock()
+            entries = []
+            items = [(key, True, entry) for key, entry in store.items()]
+            items.extend((key, False, entry) for key, entry in store.unhashable)
+            for key, hashable, entry in items:
+                if isinstance(entry if cache.ttl is None else entry[0], _CachedError):
+                    continue  # Failures are only worth remembering in this process
+                if cache.ttl is None:
+                    entries.append((key, hashable, entry, None))
+                elif entry[1] > now:
+                    # Deadlines only make sense to this process's clock, so save the time left instead
+                    entries.append((key, hashable, entry[0], entry[1] - now))
+        caches[cache.name] = (_source_hash(cache._fun), entries)
+    return serializer.dumps({"format": SNAPSHOT_FORMAT, "caches": caches})
+
+
+def restore(obj, data, serializer=pickle):
+    """
+    Loads results saved by :func:`fin.cache.snapshot` into the caches of ``obj``, returning the number of results restored.
+    Results for methods that ``obj`` doesn't have, or whose source has changed since the snapshot, are ignored, as are
+    results that have since expired.  Existing results for the same arguments are replaced.
+    """
+    data = serializer.loads(data)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("Unsupported snapshot format: %r" % (data.get("format"), ))
+    restored = 0
+    for cache in _caches_of(obj):
+        saved = data["caches"].get(cache.name)
+        if saved is None or saved[0] != _source_hash(cache._fun):
+            continue
+        with cache._lock:
+            store = cache.get_cache(obj)
+            now = cache._clock()
+            for key, hashable, result, remaining in saved[1]:
+                if cache.ttl is None:
+                    entry = result
+                else:
+                    # Entries saved without a ttl get a full one
+                    entry = (result, now + (cache.ttl if remaining is None else min(remaining, cache.ttl)))
+                if not hashable:
+                    cache._discard(store, key, hashable)
+                cache._put(store, key, hashable, entry)
+                restored += 1
+    if _BUDGET is not None:
+        _BUDGET.enforce()
+    return restored
+
+
+def warm(obj, method, arguments, workers=1):
+    """
+    Fills the cache of ``method`` on ``obj``, by calling it with each item of ``arguments`` as its only argument.  ``method``
+    is the cached method, or its name, or a cached function, in which case ``obj`` should be None.  With ``workers`` greater than 1, the calls are made from that many threads, so
+    slow, I/O bound, methods are warmed in parallel (the method should be created with ``threadsafe=True``)::
+
+        >>> fin.cache.warm(lookup, Lookup.fetch, popular_keys, workers=8)
+
+    Otherwise, if the method has a ``batch`` function, all the arguments are computed with :meth:`many`.
+    """
+    if isinstance(method, str):
+        method = getattr(obj, method)
+    cache = _result_cache(method)
+    is_function = isinstance(cache, FunctionCache)
+    if is_function and obj is not None:
+        raise ValueError("%s is a function, so there is no object to warm it for, pass None" % cache.name)
+    if is_function or getattr(method, "__self__", None) is obj:
+        call = method
+    else:
+        call = functools.partial(method, obj)
+    if workers <= 1:
+        if cache is not None and cache.many is not None and cache._batch is not None:
+            if is_function:
+                cache.many(list(arguments))
+            else:
+                cache.many(obj, list(arguments))
+            return
+        for argument in arguments:
+            call(argument)
+        return
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(workers)
+    try:
+        pool.map(call, arguments)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class FastProperty(object):
+
+    """
+    A cached property that stores its value in the instance ``__dict__``, under the attribute's own name (like
+    ``functools.cached_property``).  As it is not a data descriptor, once the value is cached Python finds it in ``__dict__``
+    without calling into fin at all.  Create these with ``@fin.cache.property(fast=True)``::
+
+        >>> class Example(object):
+
+        >>>     @fin.cache.property(fast=True)
+        >>>     def number(self):
+        >>>         return expensive_calculation()
+
+    ``reset``, ``has_cached`` and ``temporary_cache`` work as for :class:`fin.cache.property`.  As Python doesn't call a
+    non-data descriptor on assignment, assigning to the attribute sets the cached value directly, whatever it is (so
+    assigning a callable, or None, stores it as the value), and ``del obj.number`` resets it.  Use ``override`` for the
+    equivalent of assigning a callable to a :class:`fin.cache.property`::
+
+        >>> Example.number.override(e, lambda e: random.randint(1, 10))   # Called on every access
+        >>> Example.number.override(e, None)                               # Back to caching
+
+    Dependencies must use ``tracked=True``, as there is nowhere to check them on each access.  ``async def`` methods aren't
+    supported, as the awaitable would be cached rather than the result.  Instances need a ``__dict__``.
+    """
+
+    def __init__(self, fun):
+        if DEPENDENCIES in fun.__dict__:
+            raise ValueError("fast properties can only use tracked dependencies: @fin.cache.depends(..., tracked=True)")
+        if _is_coroutine_function(fun):
+            raise TypeError("fast properties can't cache async def methods, use @fin.cache.property: %s" % fun.__name__)
+        self._fun = fun
+        self._tracked = fun.__dict__.get(TRACKED_DEPENDENCIES, ())
+        self.name = fun.__name__
+        self.__doc__ = getattr(fun, "__doc__", None)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, inst, cls):
+        if inst is None:
+            return self
+        overrides = inst.__dict__.get(PROPERTY_OVERRIDE_KEY)
+        if overrides is not None and self in overrides:
+            # Not cached, so that the override is called every time
+            return overrides[self](inst)
+        if self._tracked:
+            _check_tracked(self.name, inst)
+        value = self._fun(inst)
+        inst.__dict__[self.name] = value
+        if self._tracked:
+            dependants = _instance_cache(inst, True).setdefault(DEPENDANTS, {})
+            for name in self._tracked:
+                dependants.setdefault(name, set()).add(self)
+        return value
+
+    def reset(self, inst):
+        inst.__dict__.pop(self.name, None)
+        _invalidate_dependants(inst, self.name)
+
+    def override(self, inst, fun):
+        """
+        Makes reading the attribute on ``inst`` call ``fun(inst)`` every time, or, if ``fun`` is None, go back to
+        caching.  Either way, any cached value is reset.
+        """
+        if fun is None:
+            inst.__dict__.get(PROPERTY_OVERRIDE_KEY, {}).pop(self, None)
+        else:
+            if not callable(fun):
+                raise TypeError("%s must be overridden with a callable, got %r" % (self.name, fun))
+            inst.__dict__.setdefault(PROPERTY_OVERRIDE_KEY, {})[self] = fun
+        self.reset(inst)
+
+    def has_cached(self, inst):
+        return self.name in inst.__dict__
+
+    @contextlib.contextmanager
+    def temporary_cache(self, inst):
+        old_value = inst.__dict__.pop(self.name, MISSING)
+        try:
+            yield
+        finally:
+            inst.__dict__.pop(self.name, None)
+            if old_value is not MISSING:
+                inst.__dict__[self.name] = old_value
+
+
 def uncached_property(fun):
     """
     Behaves like the builtin :keyword:`@property` decorator, but supports the same assignment logic as ``@fin.cache.property``.  
@@ -0,0 +1,5 @@
+import sys
+
+if sys.version_info >= (3, 7):
+    # The tests need async generators (3.6) and asyncio.run (3.7), and older versions can't even parse them
+    from fin._cache_async_cases import *
@@ -0,0 +1,481 @@
+"""
+Storage backends for :mod:`fin.cache`.
+
+By default, cached results are stored on the object that the cached method was called on, so they are
+private to that object, and to the current process.  A backend replaces that storage with one that
+is shared by every object, and (depending on the backend) by other processes::
+
+    CACHE = fin.cache_backends.DiskBackend("/var/cache/myapp", max_bytes=2 ** 30)
+
+    class Geocoder(object):
+
+        @fin.cache.method(backend=CACHE)
+        def lookup(self, address):
+            return slow_remote_lookup(address)
+
+As the results are shared, the object is **not** part of the cache key, only the function's qualified
+name and the arguments are.  Backends suit classmethods, and methods whose result depends only on their
+arguments (or pass ``key=`` to include whatever state on the object matters).  Results must be picklable.
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pickle
+import struct
+import tempfile
+
+import fin.cache
+
+
+def _encode(value, out):
+    # Containers are encoded element by element, and frozensets in sorted order, so that
+    # the encoding doesn't depend on per-process string hash randomisation
+    if isinstance(value, tuple):
+        out.append(b"t" + struct.pack("<Q", len(value)))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, frozenset):
+        parts = []
+        for item in value:
+            encoded = []
+            _encode(item, encoded)
+            parts.append(b"".join(encoded))
+        out.append(b"f" + struct.pack("<Q", len(parts)))
+        out.extend(sorted(parts))
+    elif value is None or isinstance(value, (bool, int, float)):
+        out.append(("%s:%r" % (type(value).__name__, value)).encode("ascii"))
+    elif isinstance(value, bytes):
+        out.append(b"b" + struct.pack("<Q", len(value)) + value)
+    elif isinstance(value, type(u"")):
+        data = value.encode("utf-8")
+        out.append(b"s" + struct.pack("<Q", len(data)) + data)
+    else:
+        data = pickle.dumps(value, protocol=2)
+        out.append(b"p" + struct.pack("<Q", len(data)) + data)
+
+
+def stable_hash(value):
+    """
+    Returns a hex digest of ``value`` that is the same in every process.  ``value`` is normally a key
+    produced by :mod:`fin.cache`, made of tuples, frozensets and simple values.  Other values are pickled.
+    """
+    out = []
+    _encode(fin.cache.freeze(value), out)
+    return hashlib.sha1(b"".join(out)).hexdigest()
+
+
+class Backend(object):
+
+    """
+    Base class for storage backends.  ``store(name)`` returns the store for one cached function, named by
+    its qualified name.  Stores are mapping-like, supporting ``get(key, default)``, ``key in store``,
+    ``store[key] = value``, ``pop(key, default)``, ``items()``, ``clear()`` and ``len(store)``, and have
+    an ``unhashable`` list for the rare keys that cannot be hashed, which is kept in-process.
+    """
+
+    def store(self, name):
+        raise NotImplementedError()
+
+
+class DiskStore(object):
+
+    """
+    The results of one cached function, stored in a directory of a :class:`DiskBackend`.
+    """
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+        self.path = os.path.join(backend.path, stable_hash(name))
+        self.unhashable = []
+
+    def _path(self, key):
+        return os.path.join(self.path, stable_hash(key))
+
+    def _read(self, path):
+        with open(path, "rb") as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return pickle.loads(mapped)
+            finally:
+                mapped.close()
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            stored_key, value = self._read(path)
+        except (IOError, OSError, EOFError, ValueError):
+            return default
+        if stored_key != key:  # A hash collision
+            return default
+        self.backend.touch(path)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, fin.cache.MISSING) is not fin.cache.MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, fin.cache.MISSING)
+        if value is fin.cache.MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        data = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+        # Written to a temporary file first, so other processes never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.rename(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self.backend.added(len(data))
+
+    def pop(self, key, default=fin.cache.MISSING):
+        value = self.get(key, fin.cache.MISSING)
+        if value is fin.cache.MISSING:
+            if default is fin.cache.MISSING:
+                raise KeyError(key)
+            return default
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+        return value
+
+    def _entry_paths(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return [os.path.join(self.path, name) for name in names if not name.startswith(".")]
+
+    def items(self):
+        items = []
+        for path in self._entry_paths():
+            try:
+                items.append(self._read(path))
+            except (IOError, OSError, EOFError, ValueError):
+                pass
+        return items
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def clear(self):
+        for path in self._entry_paths():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        del self.unhashable[:]
+
+    def __len__(self):
+        return len(self._entry_paths())
+
+
+class DiskBackend(Backend):
+
+    """
+    Stores pickled results as files under ``path``, one file per result, named by a :func:`stable_hash` of
+    the function name and arguments, so any process using the same ``path`` shares the results, and they
+    survive restarts.  Files are read through ``mmap``, so the page cache is shared between processes.
+
+    If ``max_bytes`` is given, the least recently used files are removed once the total size goes above it.
+    """
+
+    # When trimming, remove files until this fraction of max_bytes is used, so trims aren't needed on every write
+    TRIM_TO = 0.9
+
+    def __init__(self, path, max_bytes=None):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self._bytes = None
+
+    def store(self, name):
+        return DiskStore(self, name)
+
+    def touch(self, path):
+        if self.max_bytes is not None:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        """
+        Returns the total size, in bytes, of the stored results.
+        """
+        return sum(size for _, size, _ in self._files())
+
+    def added(self, num_bytes):
+        if self.max_bytes is None:
+            return
+        if self._bytes is None:
+            self._bytes = self.size()
+        else:
+            self._bytes += num_bytes
+        if self._bytes > self.max_bytes:
+            self.trim()
+
+    def trim(self):
+        """
+        Removes the least recently used results until the store is below ``max_bytes``.  Other processes
+        may be writing too, so the on-disk size is re-read first.
+        """
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * self.TRIM_TO
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+        self._bytes = total
+
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+class SharedMemoryStore(object):
+
+    """
+    The results of one cached function, stored in a :class:`SharedMemoryBackend`.
+    """
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+        self.namespace = hashlib.sha1(name.encode("utf-8")).digest()[:8]
+        self.unhashable = []
+
+    def _digest(self, key):
+        return hashlib.sha1(self.namespace + stable_hash(key).encode("ascii")).digest()
+
+    def get(self, key, default=None):
+        data = self.backend.read(self._digest(key))
+        if data is None:
+            return default
+        stored_key, value = pickle.loads(data)
+        if stored_key != key:
+            return default
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, fin.cache.MISSING) is not fin.cache.MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, fin.cache.MISSING)
+        if value is fin.cache.MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        data = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        self.backend.write(self._digest(key), self.namespace, data)
+
+    def pop(self, key, default=fin.cache.MISSING):
+        value = self.get(key, fin.cache.MISSING)
+        if value is fin.cache.MISSING:
+            if default is fin.cache.MISSING:
+                raise KeyError(key)
+            return default
+        self.backend.delete(self._digest(key))
+        return value
+
+    def items(self):
+        return [pickle.loads(data) for data in self.backend.namespace_entries(self.namespace)]
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+        del self.unhashable[:]
+
+    def __len__(self):
+        return len(self.backend.namespace_entries(self.namespace))
+
+
+class SharedMemoryBackend(Backend):
+
+    """
+    Stores pickled results in a block of shared memory, so that worker processes forked from the process
+    that created the backend (such as a ``multiprocessing.Pool``, or pre-forking web server workers) see each
+    others' results, and hold one copy of them between them.  The backend must be created before forking::
+
+        CACHE = fin.cache_backends.SharedMemoryBackend(size=256 * 2 ** 20)
+
+        class Renderer(object):
+
+            @fin.cache.method(backend=CACHE)
+            def render(self, template, context):
+                ...
+
+    The memory holds an open-addressed table of ``slots`` entries, followed by the pickled results.  Access is
+    guarded by a ``multiprocessing.Lock``.  When either the table or the data area fills up, everything is
+    discarded and filling starts again, which keeps writes O(1) and never fragments the data area.
+    Requires Python 3.8 or later.
+    """
+
+    MAGIC = b"fincache"
+    HEADER = struct.Struct("<8sQQ")  # magic, slot count, bytes of data used
+    SLOT = struct.Struct("<20s8sQQ")  # key digest, namespace, data offset, data length
+    EMPTY = b"\0" * 20
+    DELETED = b"\xff" * 20
+    # Fraction of slots that can be used before the table is considered full, to keep probe sequences short
+    MAX_LOAD = 0.75
+
+    def __init__(self, size=64 * 2 ** 20, slots=16384, lock=None):
+        if shared_memory is None:
+            raise RuntimeError("SharedMemoryBackend requires multiprocessing.shared_memory (Python 3.8+)")
+        self.slots = slots
+        self._table_offset = self.HEADER.size
+        self._data_offset = self._table_offset + slots * self.SLOT.size
+        if size <= self._data_offset:
+            raise ValueError("size must be larger than the %s bytes needed for %s slots" % (self._data_offset, slots))
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self.size = size
+        self._lock = multiprocessing.Lock() if lock is None else lock
+        self._closed = False
+        self._reset()
+
+    def store(self, name):
+        return SharedMemoryStore(self, name)
+
+    def close(self):
+        """
+        Releases the shared memory.  Call this in the process that created the backend once all workers are done.
+        Afterwards, the backend behaves as if it were empty: reads miss, and writes and deletes do nothing.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._memory.close()
+            self._memory.unlink()
+
+    @property
+    def _buf(self):
+        return self._memory.buf
+
+    def _reset(self):
+        self._buf[:self._data_offset] = b"\0" * self._data_offset
+        self.HEADER.pack_into(self._buf, 0, self.MAGIC, 0, 0)
+
+    def _slot(self, index):
+        return self.SLOT.unpack_from(self._buf, self._table_offset + index * self.SLOT.size)
+
+    def _probe(self, digest):
+        # Yields slot indexes in probe order, starting from the digest's home slot
+        start = struct.unpack_from("<Q", digest)[0] % self.slots
+        for i in range(self.slots):
+            yield (start + i) % self.slots
+
+    def _find(self, digest):
+        for index in self._probe(digest):
+            slot = self._slot(index)
+            if slot[0] == self.EMPTY:
+                return None, None
+            if slot[0] == digest:
+                return index, slot
+        return None, None
+
+    def read(self, digest):
+        with self._lock:
+            if self._closed:
+                return None
+            index, slot = self._find(digest)
+            if slot is None:
+                return None
+            _, _, offset, length = slot
+            return bytes(self._buf[offset:offset + length])
+
+    def write(self, digest, namespace, data):
+        with self._lock:
+            if self._closed:
+                return
+            _, used_slots, used_bytes = self.HEADER.unpack_from(self._buf, 0)
+            data_end = self._data_offset + used_bytes + len(data)
+            if data_end > self.size or used_slots + 1 > self.slots * self.MAX_LOAD:
+                if self._data_offset + len(data) > self.size:
+                    return  # Too big to ever fit
+                self._reset()
+                used_slots, used_bytes = 0, 0
+            target = None
+            for index in self._probe(digest):
+                slot = self._slot(index)
+                if slot[0] == digest:
+                    target = index
+                    break
+                if slot[0] == self.DELETED and target is None:
+                    target = index
+                elif slot[0] == self.EMPTY:
+                    if target is None:
+                        target = index
+                        used_slots += 1
+                    break
+            offset = self._data_offset + used_bytes
+            self._buf[offset:offset + len(data)] = data
+            self.SLOT.pack_into(self._buf, self._table_offset + target * self.SLOT.size, digest, namespace, offset, len(data))
+            self.HEADER.pack_into(self._buf, 0, self.MAGIC, used_slots, used_bytes + len(data))
+
+    def _delete_slot(self, index):
+        self.SLOT.pack_into(self._buf, self._table_offset + index * self.SLOT.size, self.DELETED, b"\0" * 8, 0, 0)
+
+    def delete(self, digest):
+        with self._lock:
+            if self._closed:
+                return
+            index, _ = self._find(digest)
+            if index is not None:
+                self._delete_slot(index)
+
+    def namespace_entries(self, namespace):
+        with self._lock:
+            if self._closed:
+                return []
+            entries = []
+            for index in range(self.slots):
+                digest, slot_namespace, offset, length = self._slot(index)
+                if slot_namespace == namespace and digest not in (self.EMPTY, self.DELETED):
+                    entries.append(bytes(self._buf[offset:offset + length]))
+            return entries
+
+    def clear(self, namespace):
+        with self._lock:
+            if self._closed:
+                return
+            for index in range(self.slots):
+                digest, slot_namespace, _, _ = self._slot(index)
+                if slot_namespace == namespace and digest not in (self.EMPTY, self.DELETED):
+                    self._delete_slot(index)
@@ -0,0 +1,214 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import fin.testing
+import fin.cache
+import fin.cache_backends
+
+
+class TestStableHash(fin.testing.TestCase):
+
+    def test_stable(self):
+        key = (None, ({"b": 1, "a": [1.5, u"x", b"y"]}, set(["p", "q", "r"])), ())
+        self.assertEqual(fin.cache_backends.stable_hash(key), fin.cache_backends.stable_hash(key))
+        self.assertNotEqual(fin.cache_backends.stable_hash((1, )), fin.cache_backends.stable_hash((True, )))
+        self.assertNotEqual(fin.cache_backends.stable_hash(("1", )), fin.cache_backends.stable_hash((1, )))
+
+    def test_same_across_processes(self):
+        key = (frozenset(["alpha", "beta", "gamma", "delta"]), "epsilon")
+        pool = multiprocessing.Pool(1)
+        try:
+            other = pool.apply(fin.cache_backends.stable_hash, (key, ))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(other, fin.cache_backends.stable_hash(key))
+
+
+class TestDiskBackend(fin.testing.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def _make_class(self, counter, **options):
+        backend = fin.cache_backends.DiskBackend(self.path, **options)
+        class Foo(object):
+            @fin.cache.method(backend=backend)
+            def meth(self, num, data=None):
+                return (num, next(counter))
+        return Foo
+
+    def test_shared_between_objects_and_classes(self):
+        counter = itertools.count()
+        Foo = self._make_class(counter)
+        self.assertEqual(Foo().meth(1), (1, 0))
+        self.assertEqual(Foo().meth(1), (1, 0))
+        self.assertEqual(Foo().meth(1, data={"a": [1]}), (1, 1))
+        self.assertEqual(Foo().meth(1, data={"a": [1]}), (1, 1))
+        # A fresh class, with the same qualified name, and backend path, as might happen after a restart
+        Bar = self._make_class(counter)
+        self.assertEqual(Bar().meth(1), (1, 0))
+        self.assertEqual(Bar().meth(2), (2, 2))
+
+    def test_methods_with_the_same_name(self):
+        backend = fin.cache_backends.DiskBackend(self.path)
+        class First(object):
+            @fin.cache.method(backend=backend)
+            def lookup(self, num):
+                return "first %s" % num
+
+        class Second(object):
+            @fin.cache.method(backend=backend)
+            def lookup(self, num):
+                return "second %s" % num
+
+        self.assertEqual(First().lookup(1), "first 1")
+        self.assertEqual(Second().lookup(1), "second 1")
+
+    def test_reset(self):
+        counter = itertools.count()
+        Foo = self._make_class(counter)
+        foo = Foo()
+        self.assertFalse(Foo.meth.has_cached(foo))
+        foo.meth(1)
+        self.assertTrue(Foo.meth.has_cached(Foo()))
+        Foo.meth.reset(foo)
+        self.assertFalse(Foo.meth.has_cached(foo))
+        self.assertEqual(foo.meth(1), (1, 1))
+
+    def test_temporary_cache(self):
+        counter = itertools.count()
+        Foo = self._make_class(counter)
+        foo = Foo()
+        foo.meth(1)
+        with Foo.meth.temporary_cache(foo):
+            self.assertEqual(foo.meth(1), (1, 1))
+        self.assertEqual(foo.meth(1), (1, 0))
+
+    def test_max_bytes(self):
+        counter = itertools.count()
+        backend = fin.cache_backends.DiskBackend(self.path, max_bytes=2000)
+        class Foo(object):
+            @fin.cache.method(backend=backend)
+            def meth(self, num):
+                return "x" * 500 + str(next(counter))
+
+        foo = Foo()
+        for i in range(20):
+            foo.meth(i)
+        self.assertLessEqual(backend.size(), 2000)
+        self.assertTrue(foo.meth(19).endswith("19"))
+
+    def test_maxsize_conflict(self):
+        backend = fin.cache_backends.DiskBackend(self.path)
+        self.assertRaises(ValueError, fin.cache.method(backend=backend, maxsize=3), lambda self: None)
+
+
+COMPUTED = []
+
+
+class Shared(object):
+
+    @classmethod
+    def make_method(cls, backend):
+        @fin.cache.method(backend=backend)
+        def square(self, num):
+            COMPUTED.append(num)
+            return num * num
+        cls.square = square
+
+
+def _square_in_worker(num):
+    return Shared().square(num), list(COMPUTED)
+
+
+@fin.testing.unittest.skipIf(fin.cache_backends.shared_memory is None, "shared_memory is not available")
+class TestSharedMemoryBackend(fin.testing.TestCase):
+
+    def setUp(self):
+        self.backend = fin.cache_backends.SharedMemoryBackend(size=64 * 1024, slots=64)
+        self.addCleanup(self.backend.close)
+        Shared.make_method(self.backend)
+        del COMPUTED[:]
+
+    def test_shared_between_processes(self):
+        context = multiprocessing.get_context("fork")
+        pool = context.Pool(2)
+        try:
+            results = pool.map(_square_in_worker, [2, 3, 4])
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual([result for result, _ in results], [4, 9, 16])
+        self.assertEqual(COMPUTED, [])
+        self.assertEqual(Shared().square(3), 9)
+        self.assertEqual(COMPUTED, [])
+        self.assertTrue(Shared.square.has_cached(Shared()))
+
+    def test_closed(self):
+        counter = itertools.count()
+        backend = fin.cache_backends.SharedMemoryBackend(size=64 * 1024, slots=64)
+        class Foo(object):
+            @fin.cache.method(backend=backend, tags=("closed", ))
+            def meth(self, num):
+                return (num, next(counter))
+
+        foo = Foo()
+        store = backend.store("a")
+        store[(1, )] = "one"
+        self.assertEqual(foo.meth(1), (1, 0))
+        backend.close()
+        backend.close()
+        # Behaves as an empty backend that can't hold anything
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.get((1, )), None)
+        store[(2, )] = "two"
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.pop((2, ), None), None)
+        store.clear()
+        self.assertEqual(foo.meth(1), (1, 1))
+        self.assertEqual(foo.meth(1), (1, 2))
+        self.assertFalse(Foo.meth.has_cached(foo))
+        Foo.meth.reset(foo)
+        Foo.meth.clear()
+        fin.cache.invalidate_tag(None, "closed")
+        self.assertEqual(Foo.meth.cache_info().entries, 0)
+
+    def test_store_operations(self):
+        store = self.backend.store("a")
+        other = self.backend.store("b")
+        store[(1, )] = "one"
+        store[(2, )] = {"two": [2]}
+        other[(1, )] = "uno"
+        self.assertEqual(store.get((1, )), "one")
+        self.assertEqual(store[(2, )], {"two": [2]})
+        self.assertEqual(other.get((1, )), "uno")
+        self.assertEqual(store.get((3, ), "missing"), "missing")
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.pop((1, )), "one")
+        self.assertEqual(store.get((1, )), None)
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(other), 1)
+
+    def test_fills_up(self):
+        store = self.backend.store("a")
+        for i in range(500):
+            store[(i, )] = "x" * 200
+        self.assertEqual(store.get((499, )), "x" * 200)
+        self.assertLess(len(store), 500)
+
+    def test_reset(self):
+        foo = Shared()
+        foo.square(2)
+        self.assertTrue(Shared.square.has_cached(foo))
+        Shared.square.reset(foo)
+        self.assertFalse(Shared.square.has_cached(foo))
+
+
+if __name__ == "__main__":
+    fin.testing.main()
@@ -1,6 +1,12 @@
 
 import collections
+import functools
+import gc
 import itertools
+import pickle
+import sys
+import threading
+import time
 
 import fin.testing
 import fin.cache
@@ -242,6 +248,224 @@ class GeneratorTest(fin.testing.TestCase):
         self.assertRaises(StopIteration, small_basket.__next__)
 
 
+class BoundedGeneratorTest(fin.testing.TestCase):
+
+    def test_trims_consumed_values(self):
+        tee = fin.cache.DynamicTee(iter(range(100)), bounded=True, chunk_size=4)
+        first, second = tee.get_copy(), tee.get_copy()
+        for i in range(50):
+            self.assertEqual(next(first), i)
+            self.assertEqual(next(second), i)
+            self.assertLessEqual(len(tee._generated), 12)
+        self.assertFalse(tee.can_replay())
+        self.assertRaises(IndexError, list, tee.get_copy())
+
+    def test_lagging_reader_holds_values(self):
+        tee = fin.cache.DynamicTee(iter(range(100)), bounded=True, chunk_size=4)
+        fast, slow = tee.get_copy(), tee.get_copy()
+        self.assertEqual(list(fast), list(range(100)))
+        self.assertEqual(len(tee._generated), 100)
+        self.assertEqual(list(slow), list(range(100)))
+        del fast, slow
+        self.assertTrue(tee.can_replay())
+
+    def test_dead_readers_release(self):
+        tee = fin.cache.DynamicTee(iter(range(100)), bounded=True, chunk_size=4)
+        abandoned = tee.get_copy()
+        next(abandoned)
+        del abandoned
+        gc.collect()
+        reader = tee.get_copy()
+        self.assertEqual(list(reader), list(range(100)))
+        self.assertLess(len(tee._generated), 12)
+
+    def test_spill(self):
+        tee = fin.cache.DynamicTee(iter(range(100)), bounded=True, spill=True, chunk_size=4)
+        self.assertEqual(list(tee.get_copy()), list(range(100)))
+        self.assertLess(len(tee._generated), 12)
+        self.assertTrue(tee.can_replay())
+        self.assertEqual(list(tee.get_copy()), list(range(100)))
+
+    def test_spill_file_closed(self):
+        tee = fin.cache.DynamicTee(iter(range(20)), bounded=True, spill=True, chunk_size=4)
+        self.assertEqual(list(tee.get_copy()), list(range(20)))
+        spill_file = tee._spill_file
+        self.assertFalse(spill_file.closed)
+        del tee
+        gc.collect()
+        if sys.version_info[0] >= 3:
+            self.assertTrue(spill_file.closed)
+
+    def test_generator_cache_restarts(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.generator(bounded=True, chunk_size=2)
+            def gen(self):
+                next(counter)
+                for i in range(10):
+                    yield i
+
+            @fin.cache.generator(bounded=True, spill=True, chunk_size=2)
+            def spilled(self):
+                next(counter)
+                for i in range(10):
+                    yield i
+
+        foo = Foo()
+        self.assertEqual(list(foo.gen()), list(range(10)))
+        self.assertEqual(list(foo.gen()), list(range(10)))
+        self.assertEqual(next(counter), 2)
+        self.assertEqual(list(foo.spilled()), list(range(10)))
+        self.assertEqual(list(foo.spilled()), list(range(10)))
+        self.assertEqual(next(counter), 4)
+
+
+class ThreadedGeneratorTest(fin.testing.TestCase):
+
+    def test_concurrent_readers(self):
+        def slow_count():
+            for i in range(2000):
+                if i % 100 == 0:
+                    time.sleep(0.001)
+                yield i
+
+        for batch_size in (1, 16):
+            tee = fin.cache.DynamicTee(slow_count(), batch_size=batch_size)
+            results = {}
+            def read(name):
+                results[name] = list(tee.get_copy())
+            threads = [threading.Thread(target=read, args=(i, )) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            self.assertEqual(len(results), 8)
+            for result in results.values():
+                self.assertEqual(result, list(range(2000)))
+
+    def test_batches(self):
+        pulled = []
+        def source():
+            for i in range(10):
+                pulled.append(i)
+                yield i
+
+        tee = fin.cache.DynamicTee(source(), batch_size=4)
+        reader = tee.get_copy()
+        self.assertEqual(next(reader), 0)
+        self.assertEqual(pulled, [0, 1, 2, 3])
+        self.assertEqual(list(reader), list(range(1, 10)))
+        self.assertRaises(StopIteration, next, reader)
+        self.assertEqual(list(tee.get_copy()), list(range(10)))
+
+    def test_generator_option(self):
+        class Foo(object):
+            @fin.cache.generator(batch_size=3)
+            def gen(self):
+                for i in range(5):
+                    yield i
+
+        self.assertEqual(list(Foo().gen()), list(range(5)))
+
+
+class PrefetchGeneratorTest(fin.testing.TestCase):
+
+    def test_prefetches_ahead(self):
+        pulled = []
+        def source():
+            for i in range(20):
+                pulled.append(i)
+                yield i
+
+        tee = fin.cache.DynamicTee(source(), prefetch=5)
+        reader = tee.get_copy()
+        self.assertEqual(next(reader), 0)
+        deadline = time.time() + 5
+        while len(pulled) < 6 and time.time() < deadline:
+            time.sleep(0.001)
+        time.sleep(0.01)
+        self.assertEqual(pulled, list(range(6)))
+        self.assertEqual(list(reader), list(range(1, 20)))
+        self.assertEqual(list(tee.get_copy()), list(range(20)))
+
+    def test_overlaps_production(self):
+        def slow_source():
+            for i in range(5):
+                time.sleep(0.02)
+                yield i
+
+        tee = fin.cache.DynamicTee(slow_source(), prefetch=5)
+        start = time.time()
+        for value in tee.get_copy():
+            time.sleep(0.02)
+        # Without prefetching this takes 0.2s, as producing and consuming alternate
+        self.assertLess(time.time() - start, 0.18)
+
+    def test_keeps_prefetching_past_the_buffer(self):
+        def slow_source():
+            for i in range(20):
+                time.sleep(0.01)
+                yield i
+
+        # The consumer is the slower side, so the buffer fills up, and reading it (without the lock, from an unbounded tee)
+        # has to let the producer carry on
+        tee = fin.cache.DynamicTee(slow_source(), prefetch=1)
+        start = time.time()
+        for value in tee.get_copy():
+            time.sleep(0.015)
+        # Takes 0.31s, or 0.4s if the producer waits for the consumer to run out after each value
+        self.assertLess(time.time() - start, 0.36)
+
+    def test_errors(self):
+        def failing():
+            yield 1
+            raise KeyError("nope")
+
+        tee = fin.cache.DynamicTee(failing(), prefetch=2)
+        reader = tee.get_copy()
+        self.assertEqual(next(reader), 1)
+        self.assertRaises(KeyError, next, reader)
+        other = tee.get_copy()
+        self.assertEqual(next(other), 1)
+        self.assertRaises(KeyError, next, other)
+
+    def test_idle_thread_exits(self):
+        def prefetch_threads():
+            return [thread for thread in threading.enumerate() if thread.name == "fin.cache.DynamicTee prefetch"]
+
+        def wait_for_exit():
+            deadline = time.time() + 5
+            while prefetch_threads() and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(prefetch_threads(), [])
+
+        wait_for_exit()
+        tees = [fin.cache.DynamicTee(iter(range(20)), prefetch=2) for _ in range(5)]
+        readers = []
+        for tee in tees:
+            tee.prefetch_idle_timeout = 0.05
+            readers.append(tee.get_copy())
+            self.assertEqual(next(readers[-1]), 0)
+        self.assertTrue(prefetch_threads())
+        wait_for_exit()
+        self.assertTrue(all(tee._prefetcher is None for tee in tees))
+        # Reading again starts another thread, which stops in turn
+        for reader in readers:
+            self.assertEqual(list(reader), list(range(1, 20)))
+        wait_for_exit()
+
+    def test_generator_option(self):
+        class Foo(object):
+            @fin.cache.generator(prefetch=3, bounded=True, chunk_size=2)
+            def gen(self):
+                for i in range(50):
+                    yield i
+
+        foo = Foo()
+        self.assertEqual(list(foo.gen()), list(range(50)))
+        self.assertEqual(list(foo.gen()), list(range(50)))
+
+
 class ExampleCache(object):
 
     def __init__(self, callback):
@@ -282,6 +506,31 @@ class ExampleCache(object):
         return "O"
 
 
+class TrackedExample(fin.cache.Tracked):
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.epoch = 1
+
+    @fin.cache.property
+    @fin.cache.depends("epoch", tracked=True)
+    def hydrogen(self):
+        self.callback("hydrogen")
+        return "H" + str(self.epoch)
+
+    @fin.cache.property
+    @fin.cache.depends("hydrogen", tracked=True)
+    def oxygen(self):
+        self.callback("oxygen")
+        return "O" + self.hydrogen[1:]
+
+    @fin.cache.method
+    @fin.cache.depends("epoch", tracked=True)
+    def helium(self, count):
+        self.callback("helium")
+        return "He" * count
+
+
 class CacheTest(fin.testing.TestCase):
 
     def setUp(self):
@@ -326,6 +575,51 @@ class CacheTest(fin.testing.TestCase):
         self.assertEqual(a.hydrogen + a.oxygen, "H1O")
         self.assertEqual(self.counter, 4)
 
+    def test_tracked_depends(self):
+        a = TrackedExample(self._count)
+        self.assertEqual(a.hydrogen + a.oxygen, "H1O1")
+        self.assertEqual(a.hydrogen + a.oxygen, "H1O1")
+        self.assertEqual(a.helium(2), "HeHe")
+        self.assertEqual(a.helium(2), "HeHe")
+        self.assertEqual(dict(self.counters), {"hydrogen": 1, "oxygen": 1, "helium": 1})
+        a.epoch = 2
+        self.assertFalse(TrackedExample.hydrogen.has_cached(a))
+        self.assertFalse(TrackedExample.oxygen.has_cached(a))
+        self.assertFalse(TrackedExample.helium.has_cached(a))
+        self.assertEqual(a.oxygen + a.hydrogen, "O2H2")
+        self.assertEqual(a.helium(2), "HeHe")
+        self.assertEqual(dict(self.counters), {"hydrogen": 2, "oxygen": 2, "helium": 2})
+        a.unrelated = 4
+        self.assertEqual(a.oxygen + a.hydrogen, "O2H2")
+        self.assertEqual(dict(self.counters), {"hydrogen": 2, "oxygen": 2, "helium": 2})
+        del a.epoch
+        self.assertFalse(TrackedExample.hydrogen.has_cached(a))
+
+    def test_tracked_reset_cascades(self):
+        a = TrackedExample(self._count)
+        a.oxygen
+        TrackedExample.hydrogen.reset(a)
+        self.assertFalse(TrackedExample.oxygen.has_cached(a))
+        a.oxygen
+        a.hydrogen = lambda inst: "H9"
+        self.assertEqual(a.oxygen, "O9")
+
+    def test_tracked_needs_tracked_objects(self):
+        for fast in (False, True):
+            class Untracked(object):
+                value = 1
+
+                @fin.cache.property(fast=fast)
+                @fin.cache.depends("value", tracked=True)
+                def prop(self):
+                    return self.value
+
+            untracked = Untracked()
+            self.assertRaises(TypeError, getattr, untracked, "prop")
+            self.assertRaises(TypeError, getattr, untracked, "prop")
+            with fin.cache.scope():
+                self.assertRaises(TypeError, getattr, Untracked(), "prop")
+
     def test_overwriting(self):
         counter = itertools.count()
         
@@ -432,6 +726,1455 @@ class TestClassmethod(fin.testing.TestCase):
         self.assertEqual(first, third)
 
 
+class TestBoundedCache(fin.testing.TestCase):
+
+    def test_lru_eviction(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(maxsize=2)
+            def meth(self, num):
+                return (num, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(foo.meth(2), (2, 1))
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(foo.meth(3), (3, 2))  # Evicts 2, the least recently used
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(foo.meth(2), (2, 3))
+        self.assertEqual(Foo.meth.cache_info()[:5], (2, 4, 2, 2, 2))
+
+    def test_lfu_eviction(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(maxsize=2, policy="lfu")
+            def meth(self, num):
+                return (num, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(foo.meth(2), (2, 1))
+        self.assertEqual(foo.meth(2), (2, 1))
+        self.assertEqual(foo.meth(2), (2, 1))
+        self.assertEqual(foo.meth(3), (3, 2))  # Evicts 1, the least frequently used
+        self.assertEqual(foo.meth(2), (2, 1))
+        self.assertEqual(foo.meth(3), (3, 2))
+        self.assertEqual(foo.meth(1), (1, 3))
+        self.assertEqual(Foo.meth.cache_info().evictions, 2)
+
+    def test_lfu_store(self):
+        evicted = []
+        store = fin.cache.LFUStore(3, on_evict=lambda k, v: evicted.append(k))
+        for key in "abc":
+            store[key] = key.upper()
+        store.get("a")
+        store.get("b")
+        del store["c"]
+        store["d"] = "D"
+        store["e"] = "E"
+        self.assertEqual(evicted, ["d"])
+        self.assertEqual(sorted(store.keys()), ["a", "b", "e"])
+        self.assertEqual(store.pop("a"), "A")
+        self.assertEqual(len(store), 2)
+
+    def test_unhashable_args_are_bounded(self):
+        class Foo(object):
+            @fin.cache.method(maxsize=2)
+            def meth(self, data):
+                return len(data)
+
+        foo = Foo()
+        for i in range(5):
+            foo.meth([i])
+        self.assertEqual(Foo.meth.cache_info().evictions, 3)
+
+    def test_property_options(self):
+        counter = itertools.count()
+        class Foo(object):
+            def __init__(self):
+                self.value = 1
+
+            @fin.cache.property(maxsize=1)
+            @fin.cache.depends("value")
+            def prop(self):
+                return (self.value, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.prop, (1, 0))
+        foo.value = 2
+        self.assertEqual(foo.prop, (2, 1))
+        foo.value = 1
+        self.assertEqual(foo.prop, (1, 2))
+        self.assertEqual(Foo.prop.cache_info().evictions, 2)
+
+    def test_bad_policy(self):
+        self.assertRaises(ValueError, fin.cache.method(policy="random"), lambda self: None)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTL(fin.testing.TestCase):
+
+    def test_method_expires(self):
+        clock = FakeClock()
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(ttl=10, clock=clock)
+            def meth(self, num):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth(1), 0)
+        clock.now = 5
+        self.assertEqual(foo.meth(1), 0)
+        self.assertEqual(foo.meth([1]), 1)
+        clock.now = 10
+        self.assertEqual(foo.meth(1), 2)
+        self.assertEqual(foo.meth([1]), 1)
+        self.assertEqual(foo.meth(1), 2)
+        clock.now = 15
+        self.assertEqual(foo.meth([1]), 3)
+
+    def test_property_expires(self):
+        clock = FakeClock()
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.property(ttl=1, clock=clock)
+            def prop(self):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.prop, 0)
+        self.assertEqual(foo.prop, 0)
+        clock.now = 1
+        self.assertEqual(foo.prop, 1)
+
+    def test_generator_expires(self):
+        clock = FakeClock()
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.generator(ttl=1, clock=clock)
+            def gen(self):
+                yield next(counter)
+
+        foo = Foo()
+        self.assertEqual(list(foo.gen()), [0])
+        self.assertEqual(list(foo.gen()), [0])
+        clock.now = 2
+        self.assertEqual(list(foo.gen()), [1])
+
+    def test_expire_sweeps_all_objects(self):
+        clock = FakeClock()
+        class Foo(object):
+            @fin.cache.method(ttl=10, clock=clock)
+            def meth(self, num):
+                return num
+
+        foos = [Foo(), Foo()]
+        for foo in foos:
+            foo.meth(1)
+            foo.meth({})
+        clock.now = 5
+        foos[0].meth(2)
+        clock.now = 10
+        self.assertEqual(Foo.meth.expire(), 4)
+        self.assertEqual(Foo.meth.expire(), 0)
+        clock.now = 15
+        self.assertEqual(fin.cache.expire(), 1)
+
+    def test_sweeper(self):
+        sweeper = fin.cache.start_sweeper(interval=0.01)
+        self.assertTrue(sweeper.is_alive())
+        sweeper.stop()
+        sweeper.join(1)
+        self.assertFalse(sweeper.is_alive())
+
+    def test_expire_while_reading(self):
+        for policy in ("lru", "lfu"):
+            clock = FakeClock()
+            class Foo(object):
+                @fin.cache.method(ttl=1, clock=clock, maxsize=8, policy=policy)
+                def meth(self, num):
+                    return num
+
+            foo = Foo()
+            stopped = threading.Event()
+            def sweep():
+                while not stopped.is_set():
+                    Foo.meth.expire()
+            thread = threading.Thread(target=sweep)
+            thread.start()
+            try:
+                for i in range(20000):
+                    clock.now = i // 10
+                    self.assertEqual(foo.meth(i % 16), i % 16)
+            finally:
+                stopped.set()
+                thread.join()
+
+
+class Unhashable(object):
+    __hash__ = None
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Unhashable) and self.value == other.value
+
+
+class TestKeys(fin.testing.TestCase):
+
+    def test_freeze(self):
+        self.assertEqual(fin.cache.freeze({"a": [1, {2}]}), fin.cache.freeze({"a": [1, {2}]}))
+        self.assertNotEqual(fin.cache.freeze([1, 2]), fin.cache.freeze((1, 2)))
+        self.assertEqual(fin.cache.freeze((1, "a")), (1, "a"))
+        hash(fin.cache.freeze([{"a": bytearray(b"b")}, set([1])]))
+        self.assertEqual(pickle.loads(pickle.dumps(fin.cache.freeze([1]))), fin.cache.freeze([1]))
+
+    def test_frozen_keys_cant_be_forged(self):
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, value):
+                return type(value)
+
+        foo = Foo()
+        self.assertEqual(foo.meth([1, 2]), list)
+        self.assertEqual(foo.meth(("__fin.cache.list__", 1, 2)), tuple)
+        self.assertEqual(foo.meth([1, 2]), list)
+
+    def test_unhashable_args_use_dict(self):
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, data, **kwargs):
+                return len(data)
+
+        foo = Foo()
+        self.assertEqual(foo.meth([1, 2]), 2)
+        self.assertEqual(foo.meth({"a": [1]}, option={}), 1)
+        self.assertEqual(foo.meth([1, 2]), 2)
+        store = foo.__dict__[fin.cache.CACHE_KEY]
+        dict_store, = store.values()
+        self.assertEqual(len(dict_store), 2)
+        self.assertEqual(dict_store.unhashable, [])
+        self.assertEqual(Foo.meth.cache_info().hits, 1)
+
+    def test_list_and_tuple_differ(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, data):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth([1, 2]), 0)
+        self.assertEqual(foo.meth((1, 2)), 1)
+        self.assertEqual(foo.meth([1, 2]), 0)
+
+    def test_truly_unhashable(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, data):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth(Unhashable(1)), 0)
+        self.assertEqual(foo.meth([Unhashable(1)]), 1)
+        self.assertEqual(foo.meth(Unhashable(1)), 0)
+        self.assertEqual(foo.meth([Unhashable(1)]), 1)
+        self.assertEqual(foo.meth(Unhashable(2)), 2)
+
+    def test_key_function(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(key=lambda user, **options: user["id"])
+            def meth(self, user, **options):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth({"id": 1, "name": "a"}), 0)
+        self.assertEqual(foo.meth({"id": 1, "name": "b"}, verbose=True), 0)
+        self.assertEqual(foo.meth({"id": 2}), 1)
+
+
+class TestThreadsafe(fin.testing.TestCase):
+
+    def _run_threads(self, target, args_list):
+        results = [None] * len(args_list)
+        def run(index, args):
+            try:
+                results[index] = target(*args)
+            except Exception as e:
+                results[index] = e
+        threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_single_flight(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.method(threadsafe=True)
+            def slow(self, num):
+                calls.append(num)
+                time.sleep(0.05)
+                return num * 2
+
+        foo = Foo()
+        results = self._run_threads(foo.slow, [(1, )] * 8)
+        self.assertEqual(results, [2] * 8)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Foo.slow.cache_info().misses, 8)
+
+    def test_different_keys_in_parallel(self):
+        second_started = threading.Event()
+        class Foo(object):
+            @fin.cache.method(threadsafe=True)
+            def meth(self, num):
+                if num == 1:
+                    # Would time out if the call for 2 had to wait for this one
+                    return second_started.wait(5)
+                second_started.set()
+                return True
+
+        foo = Foo()
+        self.assertEqual(self._run_threads(foo.meth, [(1, ), (2, )]), [True, True])
+
+    def test_errors_are_shared_not_cached(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.method(threadsafe=True)
+            def fails(self):
+                calls.append(1)
+                time.sleep(0.05)
+                raise KeyError("nope")
+
+        foo = Foo()
+        results = self._run_threads(foo.fails, [()] * 4)
+        self.assertTrue(all(isinstance(result, KeyError) for result in results))
+        self.assertEqual(len(calls), 1)
+        self.assertRaises(KeyError, foo.fails)
+        self.assertEqual(len(calls), 2)
+
+    def test_recursion(self):
+        class Foo(object):
+            @fin.cache.method(threadsafe=True)
+            def factorial(self, num):
+                if num <= 1:
+                    return 1
+                return num * self.factorial(num - 1)
+
+        self.assertEqual(Foo().factorial(10), 3628800)
+
+
+class Slotted(object):
+    __slots__ = ("value", "__weakref__")
+
+    def __init__(self, value):
+        self.value = value
+
+    @fin.cache.method(storage="weak")
+    def times(self, num):
+        return [self.value] * num
+
+    @fin.cache.property(storage="weak")
+    def doubled(self):
+        return self.value * 2
+
+
+class TestWeakStorage(fin.testing.TestCase):
+
+    def test_slotted(self):
+        ob = Slotted(2)
+        self.assertFalse(Slotted.times.has_cached(ob))
+        self.assertEqual(ob.times(2), [2, 2])
+        self.assertTrue(ob.times(2) is ob.times(2))
+        self.assertTrue(Slotted.times.has_cached(ob))
+        self.assertEqual(ob.doubled, 4)
+        ob.value = 3
+        self.assertEqual(ob.doubled, 4)
+        Slotted.doubled.reset(ob)
+        self.assertEqual(ob.doubled, 6)
+        with Slotted.doubled.temporary_cache(ob):
+            ob.value = 4
+            self.assertEqual(ob.doubled, 8)
+        self.assertEqual(ob.doubled, 6)
+
+    def test_collected(self):
+        ob = Slotted(1)
+        ob.times(3)
+        ob_id = id(ob)
+        self.assertIn(ob_id, fin.cache._WEAK_CACHES)
+        del ob
+        gc.collect()
+        self.assertNotIn(ob_id, fin.cache._WEAK_CACHES)
+
+    def test_dict_untouched(self):
+        class Foo(object):
+            @fin.cache.method(storage="weak")
+            def meth(self):
+                return 1
+
+        foo = Foo()
+        foo.meth()
+        self.assertEqual(foo.__dict__, {})
+
+    def test_errors(self):
+        class NoWeakref(object):
+            __slots__ = ()
+
+            @fin.cache.method(storage="weak")
+            def weak(self):
+                return 1
+
+            @fin.cache.method
+            def instance(self):
+                return 1
+
+        self.assertRaises(TypeError, NoWeakref().weak)
+        self.assertRaises(TypeError, NoWeakref().instance)
+        self.assertRaises(ValueError, fin.cache.method(storage="elsewhere"), lambda self: None)
+
+
+class TestStats(fin.testing.TestCase):
+
+    def test_cache_info(self):
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, data):
+                return "x" * 100
+
+        foo, bar = Foo(), Foo()
+        foo.meth(1)
+        foo.meth(1)
+        foo.meth([2])
+        bar.meth(1)
+        info = Foo.meth.cache_info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 3, 3))
+        self.assertGreaterEqual(info.bytes, 300)
+        self.assertEqual(info.time_saved, None)
+        del bar
+        gc.collect()
+        self.assertEqual(Foo.meth.cache_info().entries, 2)
+
+    def test_timed(self):
+        class Foo(object):
+            @fin.cache.property(timed=True)
+            def slow(self):
+                time.sleep(0.01)
+                return 1
+
+        foo = Foo()
+        for _ in range(3):
+            foo.slow
+        self.assertGreaterEqual(Foo.slow.cache_info().time_saved, 0.02)
+
+    def test_stats(self):
+        class StatsExample(object):
+            @fin.cache.method
+            def stats_meth(self):
+                return 1
+
+        example = StatsExample()
+        example.stats_meth()
+        stats = fin.cache.stats()
+        # Python 2 has no __qualname__, so caches are only named after the function and the class
+        if hasattr(StatsExample, "__qualname__"):
+            name = "fin.cache_test.TestStats.test_stats.<locals>.StatsExample.stats_meth"
+        else:
+            name = "fin.cache_test.StatsExample.stats_meth"
+        self.assertEqual(stats[name].misses, 1)
+        self.assertEqual(stats[name].entries, 1)
+
+
+class TestMany(fin.testing.TestCase):
+
+    def test_many(self):
+        calls = []
+        class Foo(object):
+            @fin.cache.method
+            def square(self, num):
+                calls.append(num)
+                return len(num) if isinstance(num, list) else num * num
+
+        foo = Foo()
+        foo.square(2)
+        self.assertEqual(foo.square.many(foo, [1, 2, 3, 1, [4]]), [1, 4, 9, 1, 1])
+        self.assertEqual(calls, [2, 1, 3, [4]])
+        self.assertEqual(foo.square(3), 9)
+        self.assertEqual(foo.square([4]), 1)
+        self.assertEqual(calls, [2, 1, 3, [4]])
+
+    def test_batch(self):
+        batches = []
+        def square_all(self, nums):
+            batches.append(list(nums))
+            return [num * num for num in nums]
+
+        class Foo(object):
+            @fin.cache.method(batch=square_all)
+            def square(self, num):
+                raise AssertionError("Should use the batch function")
+
+        foo = Foo()
+        self.assertEqual(Foo.square.many(foo, [1, 2, 1]), [1, 4, 1])
+        self.assertEqual(Foo.square.many(foo, [2, 3]), [4, 9])
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertEqual(foo.square(2), 4)
+
+    def test_bad_batch(self):
+        class Foo(object):
+            @fin.cache.method(batch=lambda self, nums: [])
+            def square(self, num):
+                return num * num
+
+        self.assertRaises(ValueError, Foo.square.many, Foo(), [1])
+
+
+class TestFastProperty(fin.testing.TestCase):
+
+    def test_fast_property(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.property(fast=True)
+            def prop(self):
+                "a fast property"
+                return next(counter)
+
+        foo = Foo()
+        self.assertTrue(isinstance(Foo.prop, fin.cache.FastProperty))
+        self.assertEqual(Foo.prop.__doc__, "a fast property")
+        self.assertFalse(Foo.prop.has_cached(foo))
+        self.assertEqual(foo.prop, 0)
+        self.assertEqual(foo.prop, 0)
+        self.assertEqual(foo.__dict__["prop"], 0)
+        self.assertTrue(Foo.prop.has_cached(foo))
+        Foo.prop.reset(foo)
+        self.assertEqual(foo.prop, 1)
+        with Foo.prop.temporary_cache(foo):
+            self.assertEqual(foo.prop, 2)
+        self.assertEqual(foo.prop, 1)
+        foo.prop = "assigned"
+        self.assertEqual(foo.prop, "assigned")
+        del foo.prop
+        self.assertEqual(foo.prop, 3)
+
+    def test_override(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.property(fast=True)
+            def prop(self):
+                return next(counter)
+
+        foo, other = Foo(), Foo()
+        self.assertEqual(foo.prop, 0)
+        overrides = iter([10, 11])
+        Foo.prop.override(foo, lambda inst: next(overrides))
+        self.assertFalse(Foo.prop.has_cached(foo))
+        self.assertEqual(foo.prop, 10)
+        self.assertEqual(foo.prop, 11)
+        self.assertEqual(other.prop, 1)
+        Foo.prop.override(foo, None)
+        self.assertEqual(foo.prop, 2)
+        self.assertEqual(foo.prop, 2)
+        self.assertRaises(TypeError, Foo.prop.override, foo, 5)
+        # Plain assignment can't be intercepted, so stores the value as it is
+        callback = lambda inst: 20
+        foo.prop = callback
+        self.assertIs(foo.prop, callback)
+        foo.prop = None
+        self.assertIsNone(foo.prop)
+
+    def test_tracked(self):
+        counter = itertools.count()
+        class Foo(fin.cache.Tracked):
+            def __init__(self):
+                self.value = 1
+
+            @fin.cache.property(fast=True)
+            @fin.cache.depends("value", tracked=True)
+            def prop(self):
+                return (self.value, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.prop, (1, 0))
+        self.assertEqual(foo.prop, (1, 0))
+        foo.value = 2
+        self.assertEqual(foo.prop, (2, 1))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            @fin.cache.property(fast=True)
+            @fin.cache.depends("value")
+            def untracked(self):
+                pass
+        self.assertRaises(TypeError, fin.cache.property(fast=True, ttl=1), lambda self: None)
+
+
+class SnapshotExample(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @fin.cache.method
+    def double(self, num):
+        self.calls += 1
+        return num * 2
+
+    @fin.cache.method(ttl=10, clock=FakeClock())
+    def triple(self, num):
+        self.calls += 1
+        return num * 3
+
+    @fin.cache.property
+    def prop(self):
+        self.calls += 1
+        return "prop"
+
+    @fin.cache.generator
+    def gen(self):
+        yield 1
+
+
+class TestSnapshot(fin.testing.TestCase):
+
+    def test_round_trip(self):
+        old = SnapshotExample()
+        self.assertEqual(old.double(1), 2)
+        self.assertEqual(old.double([1]), [1, 1])
+        self.assertEqual(old.prop, "prop")
+        self.assertEqual(list(old.gen()), [1])
+        new = SnapshotExample()
+        self.assertEqual(fin.cache.restore(new, fin.cache.snapshot(old)), 3)
+        self.assertEqual(new.double(1), 2)
+        self.assertEqual(new.double([1]), [1, 1])
+        self.assertEqual(new.prop, "prop")
+        self.assertEqual(new.calls, 0)
+        self.assertEqual(new.double(2), 4)
+        self.assertEqual(new.calls, 1)
+
+    def test_ttl(self):
+        clock = fin.cache._result_cache(SnapshotExample.triple)._clock
+        old = SnapshotExample()
+        old.triple(1)
+        clock.now += 5
+        old.triple(2)
+        data = fin.cache.snapshot(old)
+        clock.now += 6
+        new = SnapshotExample()
+        self.assertEqual(fin.cache.restore(new, data), 2)
+        self.assertEqual(new.triple(1), 3)
+        self.assertEqual(new.triple(2), 6)
+        self.assertEqual(new.calls, 0)
+        clock.now += 6
+        self.assertEqual(new.triple(1), 3)
+        self.assertEqual(new.calls, 1)
+        self.assertEqual(new.triple(2), 6)
+        self.assertEqual(new.calls, 1)
+
+    def test_changed_source_is_ignored(self):
+        old = SnapshotExample()
+        old.double(1)
+        data = pickle.loads(fin.cache.snapshot(old))
+        name = fin.cache._result_cache(SnapshotExample.double).name
+        data["caches"][name] = ("different", data["caches"][name][1])
+        new = SnapshotExample()
+        self.assertEqual(fin.cache.restore(new, pickle.dumps(data)), 0)
+        self.assertRaises(ValueError, fin.cache.restore, new, pickle.dumps({"format": 0}))
+
+    def test_serializer(self):
+        calls = []
+        class Serializer(object):
+            def dumps(self, data):
+                calls.append("dumps")
+                return pickle.dumps(data)
+            def loads(self, data):
+                calls.append("loads")
+                return pickle.loads(data)
+
+        old = SnapshotExample()
+        old.double(1)
+        new = SnapshotExample()
+        fin.cache.restore(new, fin.cache.snapshot(old, Serializer()), Serializer())
+        self.assertEqual(calls, ["dumps", "loads"])
+        self.assertEqual(new.double(1), 2)
+        self.assertEqual(new.calls, 0)
+
+
+class TestWarm(fin.testing.TestCase):
+
+    def test_warm(self):
+        example = SnapshotExample()
+        fin.cache.warm(example, SnapshotExample.double, range(5))
+        fin.cache.warm(example, "triple", range(5))
+        self.assertEqual(example.calls, 10)
+        self.assertEqual([example.double(i) for i in range(5)], [0, 2, 4, 6, 8])
+        self.assertEqual(example.calls, 10)
+
+    def test_workers(self):
+        threads = set()
+        class Foo(object):
+            @fin.cache.method(threadsafe=True)
+            def slow(self, num):
+                threads.add(threading.current_thread())
+                time.sleep(0.01)
+                return num
+
+        foo = Foo()
+        fin.cache.warm(foo, Foo.slow, range(20), workers=4)
+        self.assertTrue(len(threads) > 1)
+        self.assertEqual(Foo.slow.cache_info().entries, 20)
+
+    def test_batch(self):
+        batches = []
+        def fetch_all(self, nums):
+            batches.append(nums)
+            return nums
+
+        class Foo(object):
+            @fin.cache.method(batch=fetch_all)
+            def fetch(self, num):
+                return num
+
+        foo = Foo()
+        fin.cache.warm(foo, foo.fetch, [1, 2, 3])
+        self.assertEqual(batches, [[1, 2, 3]])
+        self.assertTrue(Foo.fetch.has_cached(foo))
+
+    def test_function(self):
+        batches = []
+        def fetch_all(nums):
+            batches.append(nums)
+            return [num * 2 for num in nums]
+
+        @fin.cache.function(batch=fetch_all)
+        def fetch(num):
+            raise AssertionError("Should use the batch function")
+
+        calls = []
+        @fin.cache.function
+        def double(num):
+            calls.append(num)
+            return num * 2
+
+        fin.cache.warm(None, fetch, [1, 2, 3])
+        self.assertEqual(batches, [[1, 2, 3]])
+        self.assertEqual(fetch(2), 4)
+        fin.cache.warm(None, double, [1, 2])
+        self.assertEqual((double(1), double(2)), (2, 4))
+        self.assertEqual(calls, [1, 2])
+        self.assertRaises(ValueError, fin.cache.warm, object(), double, [1])
+
+
+class TestTags(fin.testing.TestCase):
+
+    def test_invalidate_tag(self):
+        counter = itertools.count()
+        class User(object):
+            @fin.cache.property(tags=("user", ))
+            def profile(self):
+                return next(counter)
+
+            @fin.cache.method(tags=("user", "permissions"))
+            def can(self, action):
+                return next(counter)
+
+            @fin.cache.method
+            def untagged(self):
+                return next(counter)
+
+        alice, bob = User(), User()
+        self.assertEqual([alice.profile, alice.can("read"), alice.untagged()], [0, 1, 2])
+        self.assertEqual([bob.profile, bob.can("read")], [3, 4])
+        fin.cache.invalidate_tag(alice, "permissions")
+        self.assertEqual([alice.profile, alice.can("read"), alice.untagged()], [0, 5, 2])
+        fin.cache.invalidate_tag(alice, "user")
+        self.assertEqual([alice.profile, alice.can("read"), alice.untagged()], [6, 7, 2])
+        self.assertEqual([bob.profile, bob.can("read")], [3, 4])
+        fin.cache.invalidate_tag(None, "user")
+        self.assertFalse(User.profile.has_cached(alice))
+        self.assertFalse(User.can.has_cached(bob))
+        self.assertTrue(User.untagged.has_cached(alice))
+        self.assertEqual([alice.profile, bob.profile, alice.untagged()], [8, 9, 2])
+        fin.cache.invalidate_tag(None, "unknown")
+
+    def test_single_tag(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(tags="foo")
+            def meth(self, arg):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth([1]), 0)
+        fin.cache.invalidate_tag(None, "foo")
+        self.assertEqual(foo.meth([1]), 1)
+
+    def test_clear(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(maxsize=2)
+            def meth(self, arg):
+                return next(counter)
+
+        foo, bar = Foo(), Foo()
+        self.assertEqual([foo.meth(1), bar.meth(1)], [0, 1])
+        Foo.meth.clear()
+        self.assertEqual(Foo.meth.cache_info().entries, 0)
+        self.assertEqual([foo.meth(1), bar.meth(1)], [2, 3])
+
+
+class TestMemoryBudget(fin.testing.TestCase):
+
+    def tearDown(self):
+        fin.cache.set_memory_budget(None)
+
+    def test_estimate_size(self):
+        data = b"x" * 1000
+        self.assertGreater(fin.cache.estimate_size([data, data, b"y" * 1000]), 2000)
+        self.assertGreater(fin.cache.estimate_size({"key": data}), 1000)
+        self.assertGreater(fin.cache.estimate_size(memoryview(data)[1:]), 998)
+
+    def test_dropped_stores_are_forgotten(self):
+        budget = fin.cache.set_memory_budget(10000)
+        class Foo(object):
+            @fin.cache.method(maxsize=10, sizeof=lambda value: 100)
+            def meth(self, num):
+                return num
+
+        foo = Foo()
+        gc.disable()
+        try:
+            for _ in range(3):
+                with fin.cache.scope():
+                    foo.meth(1)
+                    foo.meth(2)
+                self.assertEqual(budget.used, 0)
+                self.assertEqual(Foo.meth.cache_info().entries, 0)
+            foo.meth(1)
+            self.assertEqual(budget.used, 100)
+            Foo.meth.reset(foo)
+            self.assertEqual(budget.used, 0)
+            self.assertEqual(Foo.meth.cache_info().entries, 0)
+        finally:
+            gc.enable()
+
+    def test_budget_spans_caches(self):
+        budget = fin.cache.set_memory_budget(500)
+        class Foo(object):
+            @fin.cache.method(sizeof=lambda value: 100)
+            def first(self, num):
+                return num
+
+            @fin.cache.method(sizeof=lambda value: 100)
+            def second(self, num):
+                return num
+
+        foo = Foo()
+        for num in range(4):
+            foo.first(num)
+            foo.second(num)
+        self.assertEqual(budget.used, 500)
+        self.assertEqual(budget.evictions, 3)
+        self.assertEqual(Foo.first.cache_info().entries + Foo.second.cache_info().entries, 5)
+        self.assertEqual(Foo.first.cache_info().evictions + Foo.second.cache_info().evictions, 3)
+        Foo.first.reset(foo)
+        Foo.second.clear()
+        self.assertEqual(budget.used, 0)
+
+    def test_prefers_expensive_results(self):
+        budget = fin.cache.set_memory_budget(300)
+        class Foo(object):
+            @fin.cache.method(sizeof=lambda value: 100)
+            def cheap(self, num):
+                return num
+
+            @fin.cache.method(sizeof=lambda value: 100)
+            def expensive(self, num):
+                time.sleep(0.01)
+                return num
+
+        foo = Foo()
+        foo.expensive(1)
+        foo.expensive(2)
+        foo.cheap(1)
+        foo.cheap(2)
+        self.assertEqual(budget.used, 300)
+        self.assertEqual(Foo.expensive.cache_info().entries, 2)
+        self.assertEqual(Foo.cheap.cache_info().entries, 1)
+
+    def test_prefers_frequent_results(self):
+        budget = fin.cache.set_memory_budget(200)
+        class Foo(object):
+            @fin.cache.method(sizeof=lambda value: 100)
+            def meth(self, num):
+                time.sleep(0.001)
+                return [num]
+
+        foo = Foo()
+        popular = foo.meth(1)
+        for _ in range(100):
+            foo.meth(1)
+        foo.meth(2)
+        foo.meth(3)
+        self.assertEqual(budget.used, 200)
+        self.assertTrue(foo.meth(1) is popular)
+
+    def test_ttl_entries(self):
+        budget = fin.cache.set_memory_budget(1000)
+        clock = FakeClock()
+        class Foo(object):
+            @fin.cache.method(ttl=1, clock=clock, sizeof=lambda value: 100)
+            def meth(self, num):
+                return num
+
+        foo = Foo()
+        foo.meth(1)
+        foo.meth(2)
+        self.assertEqual(budget.used, 200)
+        clock.now += 2
+        self.assertEqual(Foo.meth.expire(), 2)
+        self.assertEqual(budget.used, 0)
+
+    def test_no_budget(self):
+        self.assertEqual(fin.cache.set_memory_budget(None), None)
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, num):
+                return num
+
+        Foo().meth(1)
+        self.assertEqual(Foo.meth.cache_info().time_saved, None)
+
+
+class TestBackgroundRefresh(fin.testing.TestCase):
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("Timed out waiting for the refresh")
+
+    def test_serves_stale_while_refreshing(self):
+        clock = FakeClock()
+        gate = threading.Event()
+        gate.set()
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.property(ttl=10, clock=clock, refresh="background")
+            def value(self):
+                gate.wait()
+                return next(counter)
+
+        cache = fin.cache._result_cache(Foo.value)
+        foo = Foo()
+        self.assertEqual(foo.value, 0)
+        clock.now += 11
+        gate.clear()
+        self.assertEqual(foo.value, 0)
+        self.assertEqual(foo.value, 0)
+        self.assertEqual(len(cache._refreshing), 1)
+        gate.set()
+        self.wait_for(lambda: not cache._refreshing)
+        self.assertEqual(foo.value, 1)
+        self.assertEqual(foo.value, 1)
+        self.assertEqual(next(counter), 2)
+
+    def test_keeps_last_good_value(self):
+        clock = FakeClock()
+        results = iter([1, KeyError("failed"), 2])
+        class Foo(object):
+            @fin.cache.method(ttl=10, clock=clock, refresh="background", threadsafe=True)
+            def meth(self):
+                result = next(results)
+                if isinstance(result, Exception):
+                    raise result
+                return result
+
+        cache = fin.cache._result_cache(Foo.meth)
+        foo = Foo()
+        self.assertEqual(foo.meth(), 1)
+        clock.now += 11
+        self.assertEqual(foo.meth(), 1)
+        self.wait_for(lambda: not cache._refreshing)
+        self.assertEqual(cache.refresh_errors, 1)
+        self.assertEqual(foo.meth(), 1)
+        self.assertEqual(len(cache._refreshing), 0)
+        clock.now += 11
+        self.assertEqual(foo.meth(), 1)
+        self.wait_for(lambda: not cache._refreshing)
+        self.assertEqual(foo.meth(), 2)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, fin.cache.method(refresh="background"), lambda self: None)
+        self.assertRaises(ValueError, fin.cache.method(ttl=1, refresh="sometimes"), lambda self: None)
+        self.assertRaises(ValueError, fin.cache.generator(ttl=1, refresh="background"), lambda self: None)
+
+
+class TestFunction(fin.testing.TestCase):
+
+    def test_normalises_arguments(self):
+        calls = []
+        @fin.cache.function
+        def add(a, b=2, c=3):
+            calls.append((a, b, c))
+            return a + b + c
+
+        self.assertEqual(add(1), 6)
+        self.assertEqual(add(1, 2), 6)
+        self.assertEqual(add(1, b=2), 6)
+        self.assertEqual(add(c=3, a=1), 6)
+        self.assertEqual(add(1, 2, 3), 6)
+        self.assertEqual(calls, [(1, 2, 3)])
+        self.assertEqual(add(1, c=4), 7)
+        self.assertEqual(len(calls), 2)
+        self.assertRaises(TypeError, add)
+        self.assertTrue(add.has_cached())
+        add.reset()
+        self.assertFalse(add.has_cached())
+        self.assertEqual(add(1), 6)
+        self.assertEqual(len(calls), 3)
+
+    def test_keyword_arguments(self):
+        calls = []
+        @fin.cache.function
+        def fun(a, *args, **kwargs):
+            calls.append(1)
+            return (a, args, kwargs)
+
+        self.assertEqual(fun(1, x=1, y=[2]), (1, (), {"x": 1, "y": [2]}))
+        self.assertEqual(fun(1, y=[2], x=1), (1, (), {"x": 1, "y": [2]}))
+        self.assertEqual(fun(a=1, x=1, y=[2]), (1, (), {"x": 1, "y": [2]}))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(fun(1, 2, x=1, y=[2]), (1, (2, ), {"x": 1, "y": [2]}))
+        self.assertEqual(len(calls), 2)
+
+    def test_options(self):
+        calls = []
+        class Foo(object):
+            @staticmethod
+            @fin.cache.function(maxsize=2)
+            def square(num):
+                calls.append(num)
+                return num * num
+
+        self.assertEqual([Foo.square(1), Foo().square(2), Foo.square(1), Foo.square(3)], [1, 4, 1, 9])
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(Foo.square.cache_info().entries, 2)
+        self.assertEqual(Foo.square.many([1, 3, 4]), [1, 9, 16])
+        with Foo.square.temporary_cache():
+            self.assertEqual(Foo.square(3), 9)
+            self.assertEqual(calls, [1, 2, 3, 4, 3])
+        self.assertEqual(Foo.square(3), 9)
+        self.assertEqual(calls, [1, 2, 3, 4, 3])
+        self.assertRaises(ValueError, fin.cache.function, fin.cache.depends("value")(lambda: None))
+
+    def test_batch(self):
+        @fin.cache.function(batch=lambda nums: [num * 2 for num in nums])
+        def double(num):
+            raise AssertionError("Should use the batch function")
+
+        self.assertEqual(double.many([1, 2]), [2, 4])
+        self.assertEqual(double(2), 4)
+
+    def test_snapshot_and_tags(self):
+        calls = []
+        @fin.cache.function(tags=("numbers", ))
+        def double(num):
+            calls.append(num)
+            return num * 2
+
+        double(1)
+        data = fin.cache.snapshot(double)
+        double.reset()
+        self.assertEqual(fin.cache.restore(double, data), 1)
+        self.assertEqual(double(1), 2)
+        self.assertEqual(calls, [1])
+        fin.cache.invalidate_tag(None, "numbers")
+        self.assertEqual(double(1), 2)
+        self.assertEqual(calls, [1, 1])
+
+
+class TestSpecialisedWrappers(fin.testing.TestCase):
+
+    def test_method(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, a, b=None):
+                return (a, b, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.meth(1), (1, None, 0))
+        self.assertEqual(foo.meth(1), (1, None, 0))
+        self.assertEqual(foo.meth(a=1), (1, None, 1))
+        self.assertEqual(foo.meth(a=1), (1, None, 1))
+        self.assertEqual(foo.meth([1]), ([1], None, 2))
+        self.assertEqual(foo.meth([1]), ([1], None, 2))
+        self.assertEqual(foo.meth(1, 2), (1, 2, 3))
+        info = Foo.meth.cache_info()
+        self.assertEqual((info.hits, info.misses), (3, 4))
+        Foo.meth.reset(foo)
+        self.assertEqual(foo.meth(1), (1, None, 4))
+        with Foo.meth.temporary_cache(foo):
+            self.assertEqual(foo.meth(1), (1, None, 5))
+        self.assertEqual(foo.meth(1), (1, None, 4))
+
+    def test_wrapped_function(self):
+        def logged(fun):
+            @functools.wraps(fun)
+            def wrapper(*args, **kwargs):
+                return fun(*args[:1])
+            return wrapper
+
+        calls = []
+        @fin.cache.function
+        @logged
+        def fun(num):
+            calls.append(num)
+            return num
+
+        self.assertEqual(fun(1, 2), 1)
+        self.assertEqual(fun(1, 2), 1)
+        self.assertEqual(fun(1), 1)
+        self.assertEqual(calls, [1, 1])
+
+    def test_wrapped(self):
+        def logged(fun):
+            @functools.wraps(fun)
+            def wrapper(self, verbose=False):
+                return fun(self)
+            return wrapper
+
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method
+            @logged
+            def meth(self):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual(foo.meth(), 0)
+        self.assertEqual(foo.meth(True), 1)
+        self.assertEqual(foo.meth(True), 1)
+        self.assertEqual(foo.meth(), 0)
+
+    def test_no_arguments(self):
+        counter = itertools.count()
+        class Foo(fin.cache.Tracked):
+            value = 1
+
+            @fin.cache.property
+            @fin.cache.depends("value", tracked=True)
+            def prop(self):
+                return (self.value, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.prop, (1, 0))
+        self.assertEqual(foo.prop, (1, 0))
+        foo.value = 2
+        self.assertEqual(foo.prop, (2, 1))
+        self.assertEqual(Foo.prop.cache_info().hits, 1)
+        self.assertRaises(TypeError, Foo.prop._method, foo, 1)
+
+    def test_options_use_general_wrapper(self):
+        counter = itertools.count()
+        class Foo(object):
+            @fin.cache.method(maxsize=1)
+            def meth(self, num):
+                return next(counter)
+
+        foo = Foo()
+        self.assertEqual([foo.meth(1), foo.meth(2), foo.meth(2), foo.meth(1)], [0, 1, 1, 2])
+        self.assertEqual(Foo.meth.cache_info().evictions, 2)
+
+    def test_budget_sees_hits(self):
+        budget = fin.cache.set_memory_budget(1000)
+        try:
+            class Foo(object):
+                @fin.cache.method
+                def meth(self, num):
+                    return num
+
+            foo = Foo()
+            foo.meth(1)
+            foo.meth(1)
+            cache = fin.cache._result_cache(Foo.meth)
+            store = cache.get_cache(foo)
+            self.assertEqual(budget._charges[id(store)][(None, (1, ), ())].hits, 2)
+        finally:
+            fin.cache.set_memory_budget(None)
+
+
+class TestScope(fin.testing.TestCase):
+
+    def make_class(self, counter):
+        class Foo(object):
+            @fin.cache.method
+            def meth(self, num):
+                return (num, next(counter))
+
+            @fin.cache.property
+            def prop(self):
+                return next(counter)
+        return Foo
+
+    def test_scope(self):
+        counter = itertools.count()
+        Foo = self.make_class(counter)
+        @fin.cache.function
+        def fun(num):
+            return (num, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.prop, 0)
+        with fin.cache.scope():
+            self.assertEqual(foo.prop, 1)
+            self.assertEqual(foo.prop, 1)
+            self.assertEqual(foo.meth(1), (1, 2))
+            self.assertEqual(foo.meth(1), (1, 2))
+            self.assertEqual(fun(1), (1, 3))
+            self.assertEqual(fun(1), (1, 3))
+            self.assertTrue(Foo.meth.has_cached(foo))
+            Foo.meth.reset(foo)
+            self.assertFalse(Foo.meth.has_cached(foo))
+            self.assertEqual(foo.meth(1), (1, 4))
+        self.assertEqual(fin.cache._ACTIVE_SCOPES, 0)
+        self.assertEqual(foo.prop, 0)
+        self.assertFalse(Foo.meth.has_cached(foo))
+        self.assertEqual(foo.meth(1), (1, 5))
+        self.assertEqual(fun(1), (1, 6))
+
+    def test_nested(self):
+        counter = itertools.count()
+        Foo = self.make_class(counter)
+        foo = Foo()
+        with fin.cache.scope() as outer:
+            self.assertEqual(foo.prop, 0)
+            with fin.cache.scope():
+                self.assertEqual(foo.prop, 1)
+            self.assertEqual(foo.prop, 0)
+            outer.clear()
+            self.assertEqual(foo.prop, 2)
+        with outer:
+            self.assertRaises(RuntimeError, outer.__enter__)
+
+    def test_temporary_cache(self):
+        counter = itertools.count()
+        Foo = self.make_class(counter)
+        @fin.cache.function
+        def fun(num):
+            return (num, next(counter))
+
+        foo = Foo()
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(fun(1), (1, 1))
+        with fin.cache.scope():
+            self.assertEqual(foo.meth(2), (2, 2))
+            self.assertEqual(fun(2), (2, 3))
+            with Foo.meth.temporary_cache(foo), fun.temporary_cache():
+                self.assertEqual(foo.meth(3), (3, 4))
+                self.assertEqual(foo.meth(3), (3, 4))
+                self.assertEqual(foo.meth(2), (2, 5))
+                self.assertEqual(fun(2), (2, 6))
+            self.assertEqual(foo.meth(2), (2, 2))
+            self.assertEqual(foo.meth(3), (3, 7))
+            self.assertEqual(fun(2), (2, 3))
+        self.assertEqual(foo.meth(1), (1, 0))
+        self.assertEqual(fun(1), (1, 1))
+        self.assertEqual(foo.meth(2), (2, 8))
+
+    def test_threads_have_their_own_scope(self):
+        counter = itertools.count()
+        Foo = self.make_class(counter)
+        foo = Foo()
+        seen = []
+        with fin.cache.scope():
+            self.assertEqual(foo.prop, 0)
+            thread = threading.Thread(target=lambda: seen.append(foo.prop))
+            thread.start()
+            thread.join()
+            self.assertEqual(foo.prop, 0)
+        self.assertEqual(seen, [1])
+        self.assertEqual(foo.prop, 1)
+
+class TestCacheExceptions(fin.testing.TestCase):
+
+    def make_class(self, **options):
+        calls = []
+        class Directory(object):
+            @fin.cache.method(**options)
+            def user(self, name):
+                calls.append(name)
+                if name == "missing":
+                    raise KeyError(name)
+                if name == "broken":
+                    raise ValueError(name)
+                return name.title()
+        return Directory, calls
+
+    def test_caches_exceptions(self):
+        Directory, calls = self.make_class(cache_exceptions=(KeyError, ))
+        directory = Directory()
+        for _ in range(3):
+            self.assertRaises(KeyError, directory.user, "missing")
+            self.assertRaises(ValueError, directory.user, "broken")
+            self.assertEqual(directory.user("bob"), "Bob")
+        self.assertEqual(calls, ["missing", "broken", "bob", "broken", "broken"])
+        Directory.user.reset(directory)
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertEqual(calls.count("missing"), 2)
+
+    def test_tracebacks(self):
+        Directory, calls = self.make_class(cache_exceptions=KeyError)
+        directory = Directory()
+        tracebacks = []
+        errors = []
+        for _ in range(3):
+            try:
+                directory.user("missing")
+            except KeyError as e:
+                tracebacks.append([frame.f_code.co_name for frame in traceback_frames(sys.exc_info()[2])])
+                errors.append(e)
+        # The first call raises the exception as usual, later ones raise it again, without the failed call's frames
+        self.assertIn("user", tracebacks[0])
+        self.assertNotIn("user", tracebacks[1])
+        self.assertEqual(tracebacks[1], tracebacks[2])
+        self.assertTrue(errors[0] is errors[1] is errors[2])
+        self.assertEqual(errors[0].args, ("missing", ))
+
+    def test_custom_exceptions(self):
+        calls = []
+        class Directory(object):
+            @fin.cache.method(cache_exceptions=LookupError)
+            def user(self, name):
+                calls.append(name)
+                if name == "formatted":
+                    raise NotFound(name)
+                raise Unavailable(name, "offline")
+
+        directory = Directory()
+        for attempt in range(3):
+            try:
+                directory.user("formatted")
+            except NotFound as e:
+                self.assertEqual(str(e), "no such user: formatted")
+            try:
+                directory.user("other")
+            except Unavailable as e:
+                frames = [frame.f_code.co_name for frame in traceback_frames(sys.exc_info()[2])]
+                self.assertEqual((e.args, e.reason), (("other", ), "offline"))
+                # The failed call itself raises the exception with its traceback intact
+                self.assertEqual("user" in frames, attempt == 0)
+        self.assertEqual(calls, ["formatted", "other"])
+
+    def test_context_does_not_leak(self):
+        Directory, calls = self.make_class(cache_exceptions=KeyError)
+        directory = Directory()
+        self.assertRaises(KeyError, directory.user, "missing")
+        try:
+            raise ValueError("unrelated")
+        except ValueError:
+            self.assertRaises(KeyError, directory.user, "missing")
+        try:
+            directory.user("missing")
+        except KeyError as e:
+            self.assertIsNone(e.__context__)
+            self.assertIsNone(e.__cause__)
+
+    def test_exception_ttl(self):
+        clock = FakeClock()
+        Directory, calls = self.make_class(cache_exceptions=KeyError, exception_ttl=5, ttl=60, clock=clock)
+        directory = Directory()
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertEqual(directory.user("bob"), "Bob")
+        clock.now += 4
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertEqual(len(calls), 2)
+        clock.now += 2
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertEqual(directory.user("bob"), "Bob")
+        self.assertEqual(calls, ["missing", "bob", "missing"])
+
+    def test_threadsafe_and_many(self):
+        Directory, calls = self.make_class(cache_exceptions=KeyError, threadsafe=True)
+        directory = Directory()
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertRaises(KeyError, directory.user, "missing")
+        self.assertEqual(Directory.user.many(directory, ["bob", "alice"]), ["Bob", "Alice"])
+        self.assertRaises(KeyError, Directory.user.many, directory, ["bob", "missing"])
+        self.assertEqual(calls, ["missing", "bob", "alice"])
+        try:
+            Directory.user.many(directory, ["carol", "missing", "missing", "dave"])
+        except KeyError:
+            pass
+        self.assertEqual(calls, ["missing", "bob", "alice", "carol", "dave"])
+        self.assertRaises(KeyError, Directory.user.many, directory, ["missing"])
+        self.assertEqual(len(calls), 5)
+        try:
+            Directory.user.many(Directory(), ["erin", "missing"])
+        except KeyError:
+            frames = [frame.f_code.co_name for frame in traceback_frames(sys.exc_info()[2])]
+        if sys.version_info[0] >= 3:
+            # Python 2 can't re-raise it later with its original traceback
+            self.assertIn("user", frames)
+        self.assertEqual(len(calls), 7)
+
+    def test_function(self):
+        calls = []
+        @fin.cache.function(cache_exceptions=LookupError)
+        def lookup(name):
+            calls.append(name)
+            raise IndexError(name)
+
+        self.assertRaises(IndexError, lookup, "a")
+        self.assertRaises(IndexError, lookup, name="a")
+        self.assertEqual(calls, ["a"])
+
+    def test_not_snapshotted(self):
+        Directory, calls = self.make_class(cache_exceptions=KeyError)
+        directory = Directory()
+        self.assertRaises(KeyError, directory.user, "missing")
+        directory.user("bob")
+        self.assertEqual(fin.cache.restore(Directory(), fin.cache.snapshot(directory)), 1)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, fin.cache.method(exception_ttl=1), lambda self: None)
+        self.assertRaises(ValueError, fin.cache.method(cache_exceptions=KeyError, exception_ttl=0), lambda self: None)
+        self.assertRaises(ValueError, fin.cache.generator(cache_exceptions=KeyError), lambda self: None)
+
+
+class NotFound(LookupError):
+
+    def __init__(self, name):
+        super(NotFound, self).__init__("no such user: %s" % name)
+
+
+class Unavailable(LookupError):
+
+    def __init__(self, name, reason):
+        super(Unavailable, self).__init__(name)
+        self.reason = reason
+
+
+def traceback_frames(tb):
+    while tb is not None:
+        yield tb.tb_frame
+        tb = tb.tb_next
+
+
 class TestTemporaryContext(fin.testing.TestCase):
 
     def test_method(self):